@@ -1,51 +1,484 @@
-from collections import deque
+import datetime
+import heapq
+import itertools
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import pandas as pd
+from journal import Journal
+from kunci import KunciFile
+from schema import POLI, PRIORITAS_TINGGI, PRIORITAS_BIASA
+
+
+class _PohonUrut:
+    """Treap berisi kunci kebijakan pasien menunggu di satu poli
+
+    Tambah, hapus dan peringkat (banyak kunci yang lebih kecil) dalam O(log n) harapan;
+    ``len`` adalah jumlah pasien menunggu. Simpul: [kunci, bobot acak, kiri, kanan, ukuran].
+    """
 
-class AntreanManager:
     def __init__(self):
-        self.antrean_aktif = deque()
-        self.sudah_dipanggil = deque()
-    
-    def tambah_pasien(self, id_pasien):
+        self._akar = None
+
+    def __len__(self):
+        return self._ukuran(self._akar)
+
+    @staticmethod
+    def _ukuran(simpul):
+        return simpul[4] if simpul is not None else 0
+
+    def _perbarui(self, simpul):
+        simpul[4] = 1 + self._ukuran(simpul[2]) + self._ukuran(simpul[3])
+        return simpul
+
+    def _pisah(self, simpul, kunci):
+        """(simpul dengan kunci < ``kunci``, sisanya)"""
+        if simpul is None:
+            return None, None
+        if simpul[0] < kunci:
+            kiri, kanan = self._pisah(simpul[3], kunci)
+            simpul[3] = kiri
+            return self._perbarui(simpul), kanan
+        kiri, kanan = self._pisah(simpul[2], kunci)
+        simpul[2] = kanan
+        return kiri, self._perbarui(simpul)
+
+    def _gabung(self, kiri, kanan):
+        if kiri is None:
+            return kanan
+        if kanan is None:
+            return kiri
+        if kiri[1] > kanan[1]:
+            kiri[3] = self._gabung(kiri[3], kanan)
+            return self._perbarui(kiri)
+        kanan[2] = self._gabung(kiri, kanan[2])
+        return self._perbarui(kanan)
+
+    def tambah(self, kunci):
+        kiri, kanan = self._pisah(self._akar, kunci)
+        self._akar = self._gabung(self._gabung(kiri, [kunci, random.random(), None, None, 1]), kanan)
+
+    def hapus(self, kunci):
+        self._akar = self._hapus(self._akar, kunci)
+
+    def _hapus(self, simpul, kunci):
+        if simpul is None:
+            return None
+        if simpul[0] == kunci:
+            return self._gabung(simpul[2], simpul[3])
+        if kunci < simpul[0]:
+            simpul[2] = self._hapus(simpul[2], kunci)
+        else:
+            simpul[3] = self._hapus(simpul[3], kunci)
+        return self._perbarui(simpul)
+
+    def peringkat(self, kunci):
+        """Banyak kunci yang lebih kecil dari ``kunci``"""
+        simpul = self._akar
+        jumlah = 0
+        while simpul is not None:
+            if simpul[0] < kunci:
+                jumlah += self._ukuran(simpul[2]) + 1
+                simpul = simpul[3]
+            else:
+                simpul = simpul[2]
+        return jumlah
+
+
+class UrutanAntrean:
+    """Antrean berurutan tanpa duplikat dengan tambah, ambil depan, cek anggota dan hapus O(1)
+
+    Dipakai seperti deque (len, iterasi, reversed, bool, ``[0]``/``[-1]``).
+    """
+
+    def __init__(self, isi=()):
+        self._urutan = OrderedDict()
+        self.extend(isi)
+
+    def append(self, id_pasien):
+        if id_pasien not in self._urutan:
+            self._urutan[id_pasien] = None
+
+    def extend(self, daftar_id):
+        for id_pasien in daftar_id:
+            self.append(id_pasien)
+
+    def popleft(self):
+        if not self._urutan:
+            raise IndexError("pop from an empty antrean")
+        return self._urutan.popitem(last=False)[0]
+
+    def remove(self, id_pasien):
+        try:
+            del self._urutan[id_pasien]
+        except KeyError:
+            raise ValueError(f"{id_pasien} tidak ada dalam antrean") from None
+
+    def clear(self):
+        self._urutan.clear()
+
+    def __contains__(self, id_pasien):
+        return id_pasien in self._urutan
+
+    def __len__(self):
+        return len(self._urutan)
+
+    def __iter__(self):
+        return iter(self._urutan)
+
+    def __reversed__(self):
+        return reversed(self._urutan)
+
+    def __getitem__(self, indeks):
+        if not self._urutan:
+            raise IndexError("antrean kosong")
+        if indeks == 0:
+            return next(iter(self._urutan))
+        if indeks == -1:
+            return next(reversed(self._urutan))
+        return list(self._urutan)[indeks]
+
+    def __repr__(self):
+        return f"UrutanAntrean({list(self._urutan)!r})"
+
+
+class KebijakanFIFO:
+    """Urut kedatangan murni; tanpa poli tertentu pasien yang datang paling awal dipanggil"""
+
+    def kunci(self, prioritas, waktu, urut):
+        """Kunci heap dalam satu poli; kunci terkecil dipanggil lebih dulu"""
+        return (urut,)
+
+    def pilih_poli(self, kepala):
+        """Poli berikutnya dari ``kepala`` (poli -> kunci pasien terdepan, hanya poli yang berisi)"""
+        return min(kepala, key=kepala.get)
+
+
+class KebijakanPrioritas(KebijakanFIFO):
+    """Prioritas dengan aging: pasien prioritas tinggi seolah datang ``keunggulan`` detik lebih awal
+
+    Karena semua pasien menua dengan laju yang sama, aging linear cukup dinyatakan sebagai
+    kunci tetap (waktu datang - keunggulan), sehingga heap tidak perlu disusun ulang dan
+    pasien biasa yang sudah menunggu lebih lama dari keunggulan tetap dipanggil lebih dulu.
+    """
+
+    def __init__(self, keunggulan=None):
+        self.keunggulan = keunggulan if keunggulan is not None else {PRIORITAS_TINGGI: 15 * 60}
+
+    def kunci(self, prioritas, waktu, urut):
+        return (waktu - self.keunggulan.get(prioritas, 0), urut)
+
+
+class KebijakanRoundRobin(KebijakanPrioritas):
+    """Weighted round-robin antar poli (smooth, seperti nginx); di dalam poli prioritas dengan aging"""
+
+    def __init__(self, bobot=None, keunggulan=None):
+        super().__init__(keunggulan)
+        self.bobot = bobot if bobot is not None else {poli: 1 for poli in POLI}
+        self._saat_ini = {}
+
+    def pilih_poli(self, kepala):
+        total = 0
+        for poli in kepala:
+            bobot = self.bobot.get(poli, 1)
+            self._saat_ini[poli] = self._saat_ini.get(poli, 0) + bobot
+            total += bobot
+        terpilih = max(kepala, key=lambda poli: (self._saat_ini[poli], -kepala[poli][-1]))
+        self._saat_ini[terpilih] -= total
+        return terpilih
+
+
+class AntreanManager:
+    """Antrean menunggu per poli (heap per poli, O(log n)) dan daftar pasien yang sudah dipanggil
+
+    ``antrean_aktif`` tetap berisi semua pasien menunggu dalam urutan daftar (untuk tampilan),
+    sedangkan urutan panggilan ditentukan ``kebijakan``. Dengan ``path_state`` setiap operasi
+    dicatat ke journal (diawali snapshot harian) agar urutan persis bisa dipulihkan saat restart.
+    """
+    # Journal dipadatkan menjadi satu snapshot bila lebih panjang dari ini (atau 4x isi antrean)
+    MAKS_CATATAN = 200
+
+    def __init__(self, kebijakan=None, path_state=None):
+        self.kebijakan = kebijakan or KebijakanPrioritas()
+        self.antrean_aktif = UrutanAntrean()
+        self.sudah_dipanggil = UrutanAntrean()
+        # poli -> heap [kunci, id_pasien, poli, prioritas, waktu, urut]; id None = sudah dihapus
+        self._heap = {}
+        # poli -> kunci kebijakan pasien yang masih menunggu, untuk jumlah dan posisi O(log n)
+        self._pohon = {}
+        self._entri = {}
+        self._urut = itertools.count()
+        self._journal = None
+        if path_state is not None:
+            self._journal = Journal(path_state)
+            # Terminal lain yang memakai folder data sama ikut menulis ke journal ini
+            self._kunci = KunciFile(path_state.with_name(f".{path_state.name}.lock"))
+        # Generasi journal yang sudah dimuat; berubah bila proses lain menulis snapshot baru
+        self._generasi = None
+
+    def _catat(self, record):
+        if self._journal is None:
+            return
+        try:
+            # Dipanggil di dalam transaksi(): catatan terminal lain sudah diputar ulang
+            with self._kunci:
+                self._journal.catat(record)
+                if self._journal.jumlah > max(self.MAKS_CATATAN, 4 * (len(self.antrean_aktif) + len(self.sudah_dipanggil))):
+                    self._tulis_snapshot(self._snapshot())
+        except OSError as e:
+            print(f"Warning: Gagal menyimpan status antrean: {e}")
+
+    def _snapshot(self):
+        menunggu = [[id_pasien, *self._entri[id_pasien][2:5]] for id_pasien in self.antrean_aktif]
+        return {
+            'aksi': 'snapshot',
+            'tanggal': datetime.date.today().strftime("%Y-%m-%d"),
+            'menunggu': menunggu,
+            'dipanggil': list(self.sudah_dipanggil)
+        }
+
+    def _tulis_snapshot(self, record):
+        # Journal diganti satu baris snapshot secara atomik
+        path = self._journal.path
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        self._journal.offset = os.path.getsize(path)
+        self._journal.jumlah = 1
+        self._generasi = self._journal.naikkan_generasi()
+
+    def simpan_snapshot(self):
+        """Menulis keadaan antrean saat ini sebagai awal journal yang baru"""
+        if self._journal is None:
+            return
+        try:
+            with self._kunci:
+                self._tulis_snapshot(self._snapshot())
+        except OSError as e:
+            print(f"Warning: Gagal menyimpan status antrean: {e}")
+
+    def _muat_ulang(self):
+        """Memutar ulang seluruh journal (kunci sudah dipegang); False bila tidak ada/rusak/bukan hari ini"""
+        if not self._journal.path.exists():
+            return False
+        generasi = self._journal.generasi()
+        records = self._journal.baca()
+        tanggal = datetime.date.today().strftime("%Y-%m-%d")
+        if not records or records[0].get('aksi') != 'snapshot' or records[0].get('tanggal') != tanggal:
+            return False
+        self._kosongkan()
+        self._putar_ulang(records)
+        self._generasi = generasi
+        return True
+
+    def _sinkron_terkunci(self):
+        """Memutar ulang hanya catatan baru sejak offset terakhir (kunci sudah dipegang)"""
+        if not self._journal.path.exists():
+            return False
+        if self._journal.generasi() != self._generasi:
+            # Journal diganti snapshot oleh proses lain: offset lama tidak berlaku
+            return self._muat_ulang()
+        self._putar_ulang(self._journal.baca_baru())
+        return True
+
+    def pulihkan(self):
+        """Memuat antrean hari ini dari journal status; False bila tidak ada/bukan hari ini"""
+        if self._journal is None:
+            return False
+        with self._kunci:
+            return self._muat_ulang()
+
+    def sinkronkan(self):
+        """Mengambil operasi antrean dari terminal lain
+
+        False bila journal status hilang/rusak sehingga antrean perlu dibangun ulang dari tabel.
+        """
+        if self._journal is None:
+            return True
+        try:
+            with self._kunci:
+                return self._sinkron_terkunci()
+        except OSError as e:
+            print(f"Warning: Gagal membaca status antrean: {e}")
+            return True
+
+    @contextmanager
+    def transaksi(self):
+        """Mengunci journal status untuk terminal lain, setelah lebih dulu memutar ulang operasi mereka
+
+        Perubahan antrean (dan pencatatannya) di dalam blok ini tidak bisa diselingi terminal lain,
+        sehingga dua terminal tidak memanggil pasien yang sama.
+        """
+        if self._journal is None:
+            yield
+            return
+        with self._kunci:
+            if self._kunci.tingkat == 1:
+                try:
+                    self._sinkron_terkunci()
+                except OSError as e:
+                    print(f"Warning: Gagal membaca status antrean: {e}")
+            yield
+
+    def _putar_ulang(self, records):
+        for record in records:
+            aksi = record.get('aksi')
+            if aksi == 'snapshot':
+                self._kosongkan()
+                for id_pasien, poli, prioritas, waktu in record['menunggu']:
+                    self._tambah(id_pasien, poli, prioritas, waktu)
+                self.sudah_dipanggil.extend(record['dipanggil'])
+            elif aksi == 'tambah':
+                self._tambah(record['id'], record['poli'], record['prioritas'], record['waktu'])
+            elif aksi == 'panggil':
+                if self._hapus_aktif(record['id']):
+                    self.sudah_dipanggil.append(record['id'])
+            elif aksi == 'hapus_aktif':
+                self._hapus_aktif(record['id'])
+            elif aksi == 'hapus_dipanggil':
+                if record['id'] in self.sudah_dipanggil:
+                    self.sudah_dipanggil.remove(record['id'])
+
+    def _tambah(self, id_pasien, poli, prioritas, waktu):
+        if id_pasien in self._entri:
+            return None
+        urut = next(self._urut)
+        entri = [self.kebijakan.kunci(prioritas, waktu, urut), id_pasien, poli, prioritas, waktu, urut]
+        heapq.heappush(self._heap.setdefault(poli, []), entri)
+        self._pohon.setdefault(poli, _PohonUrut()).tambah(entri[0])
+        self._entri[id_pasien] = entri
         self.antrean_aktif.append(id_pasien)
-    
-    def panggil_berikutnya(self):
-        if self.antrean_aktif:
-            id_pasien = self.antrean_aktif.popleft()
+        return entri
+
+    def tambah_pasien(self, id_pasien, poli=None, prioritas=PRIORITAS_BIASA, waktu=None):
+        if waktu is None or pd.isna(waktu):
+            waktu = time.time()
+        elif hasattr(waktu, 'timetuple'):
+            # datetime/Timestamp dari database adalah waktu lokal, sama seperti time.time()
+            waktu = time.mktime(waktu.timetuple())
+        if prioritas is None or pd.isna(prioritas):
+            prioritas = PRIORITAS_BIASA
+        with self.transaksi():
+            if self._tambah(id_pasien, poli, int(prioritas), waktu) is not None:
+                self._catat({'aksi': 'tambah', 'id': id_pasien, 'poli': poli, 'prioritas': int(prioritas), 'waktu': waktu})
+
+    def _kepala(self, poli):
+        heap = self._heap.get(poli)
+        # Entri yang sudah dihapus dibuang saat sampai di puncak heap
+        while heap and heap[0][1] is None:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def panggil_berikutnya(self, poli=None):
+        """Memanggil pasien berikutnya di ``poli``, atau dari semua poli menurut kebijakan"""
+        with self.transaksi():
+            if poli is None:
+                kepala = {}
+                for nama_poli in list(self._heap):
+                    entri = self._kepala(nama_poli)
+                    if entri is not None:
+                        kepala[nama_poli] = entri[0]
+                if not kepala:
+                    return None
+                poli = self.kebijakan.pilih_poli(kepala)
+            entri = self._kepala(poli)
+            if entri is None:
+                return None
+            heapq.heappop(self._heap[poli])
+            self._pohon[poli].hapus(entri[0])
+            id_pasien = entri[1]
+            del self._entri[id_pasien]
+            self.antrean_aktif.remove(id_pasien)
             self.sudah_dipanggil.append(id_pasien)
+            # Yang dicatat id-nya, bukan "ambil depan", agar pemulihan tidak bergantung kebijakan
+            self._catat({'aksi': 'panggil', 'id': id_pasien})
             return id_pasien
-        return None
-    
+
+    def ganti_kebijakan(self, kebijakan):
+        """Mengganti kebijakan dan menyusun ulang heap serta pohon dengan kunci baru (O(n log n))"""
+        self.kebijakan = kebijakan
+        self._heap = {}
+        self._pohon = {}
+        for entri in self._entri.values():
+            entri[0] = kebijakan.kunci(entri[3], entri[4], entri[5])
+            self._heap.setdefault(entri[2], []).append(entri)
+            self._pohon.setdefault(entri[2], _PohonUrut()).tambah(entri[0])
+        for heap in self._heap.values():
+            heapq.heapify(heap)
+
+    def jumlah_menunggu(self, poli=None):
+        if poli is None:
+            return len(self.antrean_aktif)
+        return len(self._pohon.get(poli, ()))
+
     def get_terakhir_dipanggil(self):
         if self.sudah_dipanggil:
             return self.sudah_dipanggil[-1]
         return None
-    
-    def reset(self):
-        self.antrean_aktif.clear()
-        self.sudah_dipanggil.clear()
-    
-    def initialize_from_data(self, menunggu_ids, terpanggil_ids):
+
+    def posisi(self, id_pasien):
+        """Posisi pasien dalam antrean poli-nya menurut kebijakan (1 = berikutnya), atau None"""
+        entri = self._entri.get(id_pasien)
+        if entri is None:
+            return None
+        return 1 + self._pohon[entri[2]].peringkat(entri[0])
+
+    def _kosongkan(self):
         self.antrean_aktif.clear()
         self.sudah_dipanggil.clear()
-        
-        for id_pasien in menunggu_ids:
-            self.antrean_aktif.append(id_pasien)
-            
-        for id_pasien in terpanggil_ids:
-            self.sudah_dipanggil.append(id_pasien)
+        self._heap = {}
+        self._pohon = {}
+        self._entri = {}
+
+    def reset(self):
+        self._kosongkan()
+        self.simpan_snapshot()
+
+    def initialize_from_data(self, menunggu_ids, terpanggil_ids, info=None):
+        """``info``: id -> (poli, prioritas, waktu daftar) untuk pasien menunggu"""
+        self._kosongkan()
+        info = info or {}
+
+        journal, self._journal = self._journal, None
+        try:
+            for id_pasien in menunggu_ids:
+                self.tambah_pasien(id_pasien, *info.get(id_pasien, ()))
+        finally:
+            self._journal = journal
+        self.sudah_dipanggil.extend(terpanggil_ids)
+        self.simpan_snapshot()
 
     def hapus_dari_dipanggil(self, id_pasien):
-        if id_pasien in self.sudah_dipanggil:
-            temp_list = list(self.sudah_dipanggil)
-            temp_list.remove(id_pasien)
-            self.sudah_dipanggil = deque(temp_list)
-            return True
-        return False
+        with self.transaksi():
+            if id_pasien in self.sudah_dipanggil:
+                self.sudah_dipanggil.remove(id_pasien)
+                self._catat({'aksi': 'hapus_dipanggil', 'id': id_pasien})
+                return True
+            return False
+
+    def _hapus_aktif(self, id_pasien):
+        entri = self._entri.pop(id_pasien, None)
+        if entri is None:
+            return False
+        # Penghapusan malas: ditandai saja, dibuang saat sampai di puncak heap
+        entri[1] = None
+        self.antrean_aktif.remove(id_pasien)
+        self._pohon[entri[2]].hapus(entri[0])
+        heap = self._heap[entri[2]]
+        if len(heap) > 64 and len(heap) > 2 * self.jumlah_menunggu(entri[2]):
+            self._heap[entri[2]] = [e for e in heap if e[1] is not None]
+            heapq.heapify(self._heap[entri[2]])
+        return True
 
     def hapus_dari_aktif(self, id_pasien):
-        if id_pasien in self.antrean_aktif:
-            temp_list = list(self.antrean_aktif)
-            temp_list.remove(id_pasien)
-            self.antrean_aktif = deque(temp_list)
-            return True
-        return False
+        with self.transaksi():
+            if self._hapus_aktif(id_pasien):
+                self._catat({'aksi': 'hapus_aktif', 'id': id_pasien})
+                return True
+            return False
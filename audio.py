@@ -1,28 +1,280 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from collections import OrderedDict, deque
+from pathlib import Path
 import pyttsx3
 
+# Jeda antar potongan suara saat pengumuman disusun (detik)
+JEDA_FRASA = 0.15
+
+
+class _Pengumuman:
+    def __init__(self, teks, kunci, bagian=None):
+        self.teks = teks
+        self.kunci = kunci
+        # Potongan frasa untuk disusun dari klip WAV tersimpan; None = langsung text-to-speech
+        self.bagian = bagian
+        self.selesai = threading.Event()
+
+
+def putar_wav(path):
+    """Memutar file WAV lewat pemutar bawaan sistem (winsound/afplay/aplay)"""
+    if sys.platform == 'win32':
+        import winsound
+        winsound.PlaySound(str(path), winsound.SND_FILENAME)
+        return
+    pemutar = shutil.which('afplay' if sys.platform == 'darwin' else 'aplay')
+    if pemutar is None:
+        raise OSError("Pemutar WAV tidak ditemukan")
+    perintah = [pemutar, str(path)] if sys.platform == 'darwin' else [pemutar, '-q', str(path)]
+    subprocess.run(perintah, check=True)
+
+
+def gabung_wav(daftar_path, tujuan, jeda=JEDA_FRASA):
+    """Menyambung beberapa WAV (format sama) menjadi satu file dengan jeda hening di antaranya"""
+    parameter = None
+    potongan = []
+    for path in daftar_path:
+        with wave.open(str(path), 'rb') as w:
+            p = w.getparams()
+            if parameter is None:
+                parameter = p
+            elif (p.nchannels, p.sampwidth, p.framerate) != (parameter.nchannels, parameter.sampwidth, parameter.framerate):
+                raise wave.Error(f"Format klip suara berbeda: {path}")
+            potongan.append(w.readframes(w.getnframes()))
+    hening = b'\x00' * (int(parameter.framerate * jeda) * parameter.nchannels * parameter.sampwidth)
+    tmp_path = f"{tujuan}.tmp"
+    with wave.open(tmp_path, 'wb') as w:
+        w.setnchannels(parameter.nchannels)
+        w.setsampwidth(parameter.sampwidth)
+        w.setframerate(parameter.framerate)
+        w.writeframes(hening.join(potongan))
+    os.replace(tmp_path, tujuan)
+    return tujuan
+
+
 class AudioManager:
-    def __init__(self):
+    """Pengumuman suara diputar oleh satu thread pekerja agar terminal operator tidak tertahan
+
+    Panggil ulang (``ulang=True``) didahulukan, dan pengumuman dengan ``kunci`` yang sama
+    (mis. id pasien) yang belum diputar tidak diantrekan dua kali.
+    """
+    # Batas pengumuman yang menunggu; yang biasa dan paling lama dibuang bila penuh
+    MAKS_ANTREAN = 10
+    # Jumlah klip nama pasien yang disimpan di disk (yang paling lama tidak dipakai dihapus)
+    MAKS_NAMA = 300
+    RATE = 150
+
+    def __init__(self, folder_suara=None, frasa_tetap=(), simpan_ke=None):
+        """``folder_suara`` mengaktifkan cache klip WAV: ``frasa_tetap`` dan angka 1-999
+        dirender saat senggang, nama pasien disimpan dengan LRU. Dengan ``simpan_ke``
+        pengumuman yang tersusun ditulis ke file itu alih-alih diputar (mis. untuk pengujian).
+        """
         self.engine = None
+        self.folder_suara = Path(folder_suara) if folder_suara is not None else None
+        self.simpan_ke = simpan_ke
+        self._frasa_tetap = set()
+        self._pemanasan = deque()
+        self._nama = OrderedDict()
+        if self.folder_suara is not None:
+            (self.folder_suara / "frasa").mkdir(parents=True, exist_ok=True)
+            (self.folder_suara / "nama").mkdir(parents=True, exist_ok=True)
+            frasa = list(frasa_tetap) + [str(angka) for angka in range(1, 1000)]
+            self._frasa_tetap = set(frasa)
+            self._pemanasan.extend(frasa)
+            # Urutan LRU nama dipulihkan dari waktu terakhir dipakai (mtime, juga oleh terminal lain)
+            for path in sorted((self.folder_suara / "nama").glob("*.wav"), key=lambda p: p.stat().st_mtime):
+                if not path.name.endswith(".tmp.wav"):
+                    self._nama[path.stem] = (path, path.stat().st_mtime)
+        self._kondisi = threading.Condition()
+        self._biasa = deque()
+        self._ulang = deque()
+        self._menunggu = {}
+        self._sedang_diputar = None
+        self._berhenti = False
+        siap = threading.Event()
+        # pyttsx3 harus dipakai dari thread yang membuatnya (COM di Windows)
+        self._thread = threading.Thread(target=self._jalankan, args=(siap,), daemon=True)
+        self._thread.start()
+        siap.wait()
+
+    def _init_engine(self):
         try:
             self.engine = pyttsx3.init()
-            self.engine.setProperty('rate', 150)
+            self.engine.setProperty('rate', self.RATE)
         except Exception as e:
             print(f"Error inisialisasi text-to-speech: {e}")
-    
-    def speak(self, text):
-        if self.engine:
+
+    def speak_async(self, text, kunci=None, ulang=False, bagian=None):
+        """Mengantrekan pengumuman dan langsung kembali
+
+        Mengembalikan pengumuman dalam antrean (event ``selesai`` di-set setelah diputar),
+        atau False bila suara tidak tersedia/antrean penuh.
+        """
+        if not self.engine:
+            print(f"\n[Suara tidak tersedia] {text}")
+            return False
+        with self._kondisi:
+            if self._berhenti:
+                return False
+            lama = self._menunggu.get(kunci) if kunci is not None else None
+            if lama is not None:
+                # Pasien yang sama sudah menunggu diumumkan: cukup perbarui teksnya
+                lama.teks = text
+                lama.bagian = bagian
+                if ulang and lama in self._biasa:
+                    self._biasa.remove(lama)
+                    self._ulang.append(lama)
+                print(f"\nPanggilan suara sudah dalam antrean: {text}")
+                return lama
+            if len(self._biasa) + len(self._ulang) >= self.MAKS_ANTREAN:
+                if not self._biasa:
+                    print(f"\nAntrean suara penuh, dilewati: {text}")
+                    return False
+                terbuang = self._biasa.popleft()
+                self._lepas(terbuang)
+                print(f"\nAntrean suara penuh, dilewati: {terbuang.teks}")
+            pengumuman = _Pengumuman(text, kunci, bagian)
+            (self._ulang if ulang else self._biasa).append(pengumuman)
+            if kunci is not None:
+                self._menunggu[kunci] = pengumuman
+            self._kondisi.notify_all()
+        print(f"\nMemanggil dengan suara: {text}")
+        return pengumuman
+
+    def speak(self, text, kunci=None, ulang=False, bagian=None):
+        """Seperti speak_async tetapi menunggu sampai pengumuman selesai diputar"""
+        pengumuman = self.speak_async(text, kunci, ulang, bagian)
+        if pengumuman:
+            pengumuman.selesai.wait()
+
+    def _lepas(self, pengumuman):
+        if pengumuman.kunci is not None and self._menunggu.get(pengumuman.kunci) is pengumuman:
+            del self._menunggu[pengumuman.kunci]
+        pengumuman.selesai.set()
+
+    def _jalankan(self, siap):
+        self._init_engine()
+        siap.set()
+        if not self.engine:
+            return
+        while True:
+            frasa = None
+            with self._kondisi:
+                if self._pemanasan and not (self._berhenti or self._ulang or self._biasa):
+                    # Senggang: render satu klip frasa tetap, lalu periksa antrean lagi
+                    frasa = self._pemanasan.popleft()
+                else:
+                    self._kondisi.wait_for(lambda: self._berhenti or self._ulang or self._biasa or self._pemanasan)
+                    if not (self._ulang or self._biasa):
+                        if self._berhenti:
+                            return
+                        continue
+                    pengumuman = (self._ulang or self._biasa).popleft()
+                    # Selama diputar, pemanggilan yang sama boleh diantrekan lagi
+                    if pengumuman.kunci is not None and self._menunggu.get(pengumuman.kunci) is pengumuman:
+                        del self._menunggu[pengumuman.kunci]
+                    self._sedang_diputar = pengumuman
+            if frasa is not None:
+                try:
+                    self._klip(frasa)
+                except Exception as e:
+                    print(f"Error saat menyiapkan suara '{frasa}': {e}")
+                    self._pemanasan.clear()
+                continue
             try:
-                print(f"\nMemanggil dengan suara: {text}")
-                self.engine.say(text)
-                self.engine.runAndWait()
+                self._putar(pengumuman)
             except Exception as e:
                 print(f"Error saat memanggil dengan suara: {e}")
-        else:
-            print(f"\n[Suara tidak tersedia] {text}")
-    
-    def __del__(self):
+            finally:
+                with self._kondisi:
+                    self._sedang_diputar = None
+                    pengumuman.selesai.set()
+                    self._kondisi.notify_all()
+
+    def _putar(self, pengumuman):
+        if self.folder_suara is not None and pengumuman.bagian:
+            try:
+                # Folder suara dipakai bersama beberapa terminal: file putar per proses
+                tujuan = self.simpan_ke or self.folder_suara / f"pengumuman_{os.getpid()}.wav"
+                gabung_wav([self._klip(frasa) for frasa in pengumuman.bagian], tujuan)
+                if self.simpan_ke is None:
+                    putar_wav(tujuan)
+                return
+            except (OSError, wave.Error, EOFError, subprocess.CalledProcessError) as e:
+                print(f"Klip suara tidak bisa dipakai ({e}), memakai text-to-speech langsung")
+        self.engine.say(pengumuman.teks)
+        self.engine.runAndWait()
+
+    def _klip(self, frasa):
+        """Path WAV untuk satu frasa; dirender dengan pyttsx3 bila belum ada (hanya di thread suara)"""
+        sidik = hashlib.sha1(f"{self.RATE}|{frasa}".encode('utf-8')).hexdigest()[:20]
+        tetap = frasa in self._frasa_tetap
+        path = self.folder_suara / ("frasa" if tetap else "nama") / f"{sidik}.wav"
+        if not tetap:
+            self._nama.pop(sidik, None)
+        try:
+            if not tetap:
+                # mtime menandai klip masih dipakai, juga bagi terminal lain yang berbagi folder
+                os.utime(path)
+                self._nama[sidik] = (path, os.path.getmtime(path))
+            elif not path.exists():
+                raise FileNotFoundError(path)
+            return path
+        except FileNotFoundError:
+            pass
+        # Nama file sementara unik agar terminal lain yang merender frasa sama tidak bertabrakan
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f"{sidik}.", suffix=".tmp.wav")
+        os.close(fd)
+        try:
+            self.engine.save_to_file(frasa, tmp_path)
+            self.engine.runAndWait()
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        if not tetap:
+            self._nama[sidik] = (path, os.path.getmtime(path))
+        while len(self._nama) > self.MAKS_NAMA:
+            _, (lama, dipakai) = self._nama.popitem(last=False)
+            try:
+                # Klip yang sesudahnya dipakai terminal lain (mtime lebih baru) dibiarkan
+                if os.path.getmtime(lama) <= dipakai:
+                    os.remove(lama)
+            except OSError:
+                pass
+        return path
+
+    def tunggu_selesai(self, timeout=None):
+        """Menunggu semua pengumuman dalam antrean selesai diputar; False bila timeout"""
+        with self._kondisi:
+            return self._kondisi.wait_for(
+                lambda: not (self._ulang or self._biasa or self._sedang_diputar) or not self._thread.is_alive(),
+                timeout=timeout)
+
+    def tutup(self, tunggu=True, timeout=30):
+        """Menghentikan thread suara; dengan ``tunggu`` antrean yang tersisa diputar dulu"""
+        if tunggu:
+            self.tunggu_selesai(timeout)
+        with self._kondisi:
+            self._berhenti = True
+            for pengumuman in list(self._ulang) + list(self._biasa):
+                self._lepas(pengumuman)
+            self._ulang.clear()
+            self._biasa.clear()
+            self._kondisi.notify_all()
+        self._thread.join(timeout=5)
         try:
-            if hasattr(self, 'engine') and self.engine:
+            if self.engine:
                 self.engine.stop()
         except Exception:
-            pass  # Silent fail untuk destructor
+            pass
@@ -1,5 +1,5 @@
 import uuid
-import pandas as pd  # ✅ Sudah ada, tapi perlu dipastikan
+from database import tentukan_prioritas
 
 class CRUDHandler:
     def __init__(self, sistem_antrean):
@@ -7,8 +7,9 @@ class CRUDHandler:
         self.db = sistem_antrean.db
         self.antrean = sistem_antrean.antrean
         self.qr_scanner = sistem_antrean.qr_scanner
+        self.kamera = sistem_antrean.kamera
         self.qr_generator = sistem_antrean.qr_generator
-        self.qr_dir = sistem_antrean.qr_dir
+        self.qr_cetak_dir = sistem_antrean.qr_cetak_dir
         
         # Tambahkan UI instance
         self.ui = sistem_antrean.ui
@@ -27,9 +28,8 @@ class CRUDHandler:
             
             id_pasien = str(uuid.uuid4())
             
-            qr_filename = f"{id_pasien}.png"
-            qr_path = self.qr_generator.generate_qr_code(id_pasien, self.qr_dir / qr_filename)
-            
+            self.qr_generator.generate_qr_code(id_pasien)
+
             self.db.tambah_pasien_baru_master(
                 id_pasien=id_pasien,
                 nik=data_pasien['nik'],
@@ -39,10 +39,14 @@ class CRUDHandler:
                 tanggal_lahir=data_pasien['tanggal_lahir'],
                 alamat=data_pasien['alamat'],
                 riwayat_penyakit=data_pasien['riwayat_penyakit'],
-                qr_code_path=str(qr_path)
+                qr_code_path=None
             )
 
-            self.ui.tampilkan_pendaftaran_master_berhasil(data_pasien['nama'], str(qr_path))
+            self.ui.tampilkan_pendaftaran_master_berhasil(data_pasien['nama'], "Tersimpan di paket QR (menu 13 untuk cetak)")
+            try:
+                self.qr_generator.show_qr_code(id_pasien)
+            except Exception as e:
+                print(f"⚠️  Tidak dapat menampilkan QR code: {e}")
             
         except Exception as e:
             print(f"\nError saat mendaftarkan pasien: {e}")
@@ -63,7 +67,7 @@ class CRUDHandler:
             
             if choice == '1':
                 print("\nSilakan scan QR Code pada kartu Anda...")
-                id_pasien = self.qr_scanner.scan_from_camera()
+                id_pasien = self.kamera.scan()
                 if not id_pasien:
                     print("\nQR Code tidak terbaca atau scan dibatalkan!")
                     input("\nTekan Enter untuk kembali ke menu...")
@@ -104,18 +108,19 @@ class CRUDHandler:
                     data_antrean = antrean_hari_ini.iloc[0]
                     self.ui.tampilkan_pasien_sudah_daftar(
                         data_pasien['nama'], 
-                        data_antrean['nomor_antrean'], 
+                        self.ui.format_nomor(data_antrean), 
                         data_antrean['poli']
                     )
                 input("\nTekan Enter untuk kembali ke menu...")
                 return
             
             poli = self.ui.pilih_poli()
-            nomor_antrean = self.db.get_next_nomor_antrean()
-            success = self.db.tambah_antrean_harian(id_pasien, poli, nomor_antrean)
-            if success:
-                self.antrean.tambah_pasien(id_pasien)
-                self.ui.tampilkan_antrean_lama_berhasil(data_pasien['nama'], nomor_antrean, poli)
+            prioritas = tentukan_prioritas(data_pasien.get('tanggal_lahir'), poli)
+            kode_antrean = self.db.tambah_antrean_harian(id_pasien, poli, prioritas=prioritas)
+            if kode_antrean:
+                self.antrean.tambah_pasien(id_pasien, poli, prioritas)
+                self.ui.tampilkan_antrean_lama_berhasil(data_pasien['nama'], kode_antrean, poli)
+                print(f"Posisi antrean: {self.antrean.posisi(id_pasien)}")
             else:
                 print("\nGagal mendaftarkan antrean!")
                 
@@ -142,7 +147,7 @@ class CRUDHandler:
     def tampilkan_terpanggil(self):
         daftar_terpanggil = []
         
-        for id_pasien in reversed(list(self.antrean.sudah_dipanggil)):
+        for id_pasien in reversed(self.antrean.sudah_dipanggil):
             pasien = self.db.cari_pasien(id_pasien)
             if not pasien.empty:
                 pasien_data = pasien.iloc[0].to_dict()
@@ -167,8 +172,8 @@ class CRUDHandler:
             print("-" * 70)
             
             for i, (_, pasien) in enumerate(selesai.iterrows(), 1):
-                waktu = pasien['waktu_panggil'] if pd.notna(pasien['waktu_panggil']) else '-'  # ✅ Fix: pd.notna()
-                print(f"{i:<5}{pasien['nomor_antrean']:<15}{pasien['nama']:<30}{waktu:<20}")
+                waktu = self.ui.format_waktu(pasien['waktu_panggil'])
+                print(f"{i:<5}{self.ui.format_nomor(pasien):<15}{pasien['nama']:<30}{waktu:<20}")
         
         input("\nTekan Enter untuk kembali ke menu...")
     
@@ -188,7 +193,7 @@ class CRUDHandler:
             id_pasien = None
             if choice == '1':
                 print("\nSilakan scan QR code pasien...")
-                id_pasien = self.qr_scanner.scan_from_camera()
+                id_pasien = self.kamera.scan()
                 if not id_pasien:
                     print("\nTidak ada QR code yang terdeteksi atau scan dibatalkan.")
                     input("\nTekan Enter untuk melanjutkan...")
@@ -246,7 +251,7 @@ class CRUDHandler:
             id_pasien = None
             if choice == '1':
                 print("\nSilakan scan QR code pasien...")
-                id_pasien = self.qr_scanner.scan_from_camera()
+                id_pasien = self.kamera.scan()
                 if not id_pasien:
                     print("\nTidak ada QR code yang terdeteksi atau scan dibatalkan.")
                     input("\nTekan Enter untuk melanjutkan...")
@@ -337,7 +342,7 @@ class CRUDHandler:
             id_pasien = None
             if choice == '1':
                 print("\nSilakan scan QR code pasien...")
-                id_pasien = self.qr_scanner.scan_from_camera()
+                id_pasien = self.kamera.scan()
                 if not id_pasien:
                     print("\nTidak ada QR code yang terdeteksi atau scan dibatalkan.")
                     input("\nTekan Enter untuk melanjutkan...")
@@ -380,15 +385,15 @@ class CRUDHandler:
             print(f"Tempat Lahir  : {pasien_master.get('tempat_lahir', '-')}")
             print(f"Tanggal Lahir : {pasien_master.get('tanggal_lahir', '-')}")
             print(f"Alamat        : {pasien_master.get('alamat', '-')}")
-            print(f"Tanggal Daftar: {pasien_master.get('tanggal_daftar_pertama', '-')}")
+            print(f"Tanggal Daftar: {self.ui.format_waktu(pasien_master.get('tanggal_daftar_pertama'))}")
             
             if not hasil_antrean.empty:
                 antrean_data = hasil_antrean.iloc[0]
                 print(f"\nDATA ANTREAN HARI INI:")
-                print(f"Nomor Antrean : {antrean_data['nomor_antrean']}")
+                print(f"Nomor Antrean : {self.ui.format_nomor(antrean_data)}")
                 print(f"Poli          : {antrean_data.get('poli', '-')}")
                 print(f"Status        : {antrean_data['status']}")
-                print(f"Waktu Daftar  : {antrean_data.get('waktu_daftar', '-')}")
+                print(f"Waktu Daftar  : {self.ui.format_waktu(antrean_data.get('waktu_daftar'))}")
             
             print("="*70)
             print("⚠️  PERINGATAN:")
@@ -396,64 +401,36 @@ class CRUDHandler:
             print("✗ Data master pasien (PERMANEN)")
             print("✗ Data antrean harian (jika ada)")
             print("✗ Semua riwayat pemeriksaan")
-            print("✗ File QR Code")
+            print("✗ QR Code pasien")
             print("="*70)
             
             confirm = input("\nAnda YAKIN ingin menghapus SEMUA data pasien ini? (ketik 'HAPUS' untuk konfirmasi): ")
             if confirm == 'HAPUS':
                 try:
-                    success_count = 0
-                    error_messages = []
-                    
-                    # 1. Hapus dari antrean memory
-                    self.hapus_dari_antrean(id_pasien)
-                    print("✓ Dihapus dari antrean memory")
-                    
-                    # 2. Hapus data antrean harian (jika ada)
-                    if not hasil_antrean.empty:
-                        if self.db.hapus_pasien(id_pasien):
+                    # Antrean, pemeriksaan dan master dihapus dalam satu transaksi, lalu QR-nya
+                    # (PNG ekspor cetak ulang dan isi paket QR)
+                    qr_file_path = self.qr_cetak_dir / f"{id_pasien}.png"
+                    hasil = self.db.hapus_pasien_total(id_pasien, qr_file_path, self.qr_generator)
+
+                    print("\n" + "="*50)
+                    if hasil is None:
+                        print("❌ PENGHAPUSAN GAGAL, tidak ada data yang diubah.")
+                    else:
+                        self.hapus_dari_antrean(id_pasien)
+                        print("✓ Dihapus dari antrean memory")
+                        if hasil['antrean']:
                             print("✓ Data antrean harian berhasil dihapus")
-                            success_count += 1
+                        if hasil['pemeriksaan']:
+                            print("✓ Data pemeriksaan berhasil dihapus")
                         else:
-                            error_messages.append("✗ Gagal menghapus data antrean harian")
-                    
-                    # 3. Hapus data pemeriksaan (jika ada)
-                    if self.db.hapus_data_pemeriksaan_pasien(id_pasien):
-                        print("✓ Data pemeriksaan berhasil dihapus")
-                        success_count += 1
-                    else:
-                        print("ℹ️  Tidak ada data pemeriksaan untuk dihapus")
-                    
-                    # 4. Hapus file QR Code
-                    qr_file_path = self.qr_dir / f"{id_pasien}.png"
-                    try:
-                        if qr_file_path.exists():
-                            qr_file_path.unlink()
-                            print("✓ File QR Code berhasil dihapus")
-                            success_count += 1
+                            print("ℹ️  Tidak ada data pemeriksaan untuk dihapus")
+                        if hasil['qr']:
+                            print("✓ QR Code berhasil dihapus")
                         else:
-                            print("ℹ️  File QR Code tidak ditemukan")
-                    except Exception as e:
-                        error_messages.append(f"✗ Gagal menghapus file QR Code: {e}")
-                    
-                    # 5. Hapus data master pasien (YANG PALING PENTING!)
-                    if self.db.hapus_master_pasien(id_pasien):
-                        print("✓ Data master pasien berhasil dihapus")
-                        success_count += 1
-                    else:
-                        error_messages.append("✗ Gagal menghapus data master pasien")
-                    
-                    # Summary hasil penghapusan
-                    print("\n" + "="*50)
-                    if error_messages:
-                        print("⚠️  PENGHAPUSAN SEBAGIAN BERHASIL:")
-                        print(f"✓ Berhasil: {success_count} operasi")
-                        print("✗ Error:")
-                        for error in error_messages:
-                            print(f"  {error}")
-                    else:
-                        print("🎉 SEMUA DATA PASIEN BERHASIL DIHAPUS!")
-                        print(f"✓ Total operasi berhasil: {success_count}")
+                            print("ℹ️  QR Code tidak ditemukan")
+                        if hasil['master']:
+                            print("✓ Data master pasien berhasil dihapus")
+                        print("\n🎉 SEMUA DATA PASIEN BERHASIL DIHAPUS!")
                         print(f"Pasien '{pasien_master['nama']}' telah dihapus dari sistem.")
                     print("="*50)
                     
@@ -522,19 +499,19 @@ class CRUDHandler:
                     id_pasien = pasien['id_pasien']
                     
                     try:
-                        qr_filename = f"{id_pasien}.png"
-                        qr_path = self.qr_generator.generate_qr_code(id_pasien, str(self.qr_dir / qr_filename))
-                        
-                        print(f"\n✅ QR Code berhasil digenerate ulang!")
-                        print(f"📁 Lokasi file: {qr_path}")
+                        # Diambil dari cache/paket QR; dibuat ulang hanya bila belum ada atau desain berubah
+                        png = self.qr_generator.png_qr(id_pasien)
+                        print(f"\n✅ QR Code siap dicetak!")
 
                         try:
-                            self.qr_generator.show_qr_code(qr_path)
+                            self.qr_generator.show_qr_code(png)
                             print("\n🖼️  QR Code ditampilkan di jendela terpisah.")
                             print("📋 Silakan screenshot atau print QR code tersebut.")
                         except Exception as e:
                             print(f"⚠️  Tidak dapat menampilkan QR code: {e}")
-                            print("📁 Silakan buka file QR code secara manual untuk dicetak.")
+                            self.qr_cetak_dir.mkdir(parents=True, exist_ok=True)
+                            qr_path = self.qr_generator.simpan_ke_file(id_pasien, self.qr_cetak_dir / f"{id_pasien}.png")
+                            print(f"📁 Silakan buka file QR code secara manual untuk dicetak: {qr_path}")
                         
                         input("\nTekan Enter untuk melanjutkan...")
                     except Exception as e:
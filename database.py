@@ -1,55 +1,46 @@
 import pandas as pd
 import datetime
+import os
 import uuid
+from pathlib import Path
+from storage import ExcelStorage, KOLOM
+from schema import PRIORITAS_TINGGI, PRIORITAS_BIASA, USIA_PRIORITAS
+
+# Awalan nomor antrean per poli, mis. U-012 untuk Poli Umum
+PREFIX_POLI = {
+    'Poli Umum': 'U',
+    'Poli Gigi': 'G',
+    'Poli Lansia': 'L'
+}
+
+def buat_kode_antrean(poli, nomor):
+    prefix = PREFIX_POLI.get(poli)
+    return f"{prefix}-{nomor:03d}" if prefix else str(nomor)
+
+def tentukan_prioritas(tanggal_lahir, poli):
+    """Kelas prioritas antrean: pasien Poli Lansia atau berusia 60 tahun ke atas didahulukan"""
+    if poli == 'Poli Lansia':
+        return PRIORITAS_TINGGI
+    lahir = pd.to_datetime(tanggal_lahir, errors='coerce') if tanggal_lahir else pd.NaT
+    if pd.notna(lahir):
+        hari_ini = datetime.date.today()
+        usia = hari_ini.year - lahir.year - ((hari_ini.month, hari_ini.day) < (lahir.month, lahir.day))
+        if usia >= USIA_PRIORITAS:
+            return PRIORITAS_TINGGI
+    return PRIORITAS_BIASA
 
 class Database:
-    def __init__(self, excel_path, master_pasien_path):
+    def __init__(self, excel_path, master_pasien_path, storage=None):
         self.excel_path = excel_path
         self.master_pasien_path = master_pasien_path
         self.pemeriksaan_path = excel_path.parent / "data_pemeriksaan.xlsx"
-        self.data_pasien = self.load_data()
-        self.master_pasien = self.load_master_pasien()
-        self.data_pemeriksaan = self.load_data_pemeriksaan()
-    
-    def load_data(self):
-        """Memuat data antrean harian dari file Excel"""
-        if self.excel_path.exists():
-            return pd.read_excel(str(self.excel_path), dtype={'nik': str})
-        else:
-            df = pd.DataFrame(columns=['id', 'nomor_antrean', 'nama', 'nik', 
-                                    'tanggal', 'status', 'waktu_daftar', 'waktu_panggil', 'poli'])
-            return df
-    
-    def load_master_pasien(self):
-        """Memuat data master pasien dari file Excel"""
-        if self.master_pasien_path.exists():
-            return pd.read_excel(str(self.master_pasien_path), dtype={'nik': str})
-        else:
-            df = pd.DataFrame(columns=['id_pasien', 'nik', 'nama', 'jenis_kelamin', 'tempat_lahir',
-                                    'tanggal_lahir', 'alamat', 'riwayat_penyakit', 'tanggal_daftar_pertama', 'qr_code_path'])
-            return df
-    
-    def load_data_pemeriksaan(self):
-        if self.pemeriksaan_path.exists():
-            return pd.read_excel(str(self.pemeriksaan_path))
-        else:
-            df = pd.DataFrame(columns=['id_pemeriksaan', 'id_pasien', 'nama_pasien', 'tanggal_pemeriksaan',
-                                    'keluhan', 'tekanan_darah', 'nadi', 'suhu', 'diagnosis', 'tindakan', 
-                                    'resep', 'catatan', 'waktu_periksa'])
-            return df
-
-    def save_data(self):
-        self.data_pasien.to_excel(str(self.excel_path), index=False)
-    
-    def save_master_pasien(self):
-        self.master_pasien.to_excel(str(self.master_pasien_path), index=False)
-    
-    def save_data_pemeriksaan(self):
-        self.data_pemeriksaan.to_excel(str(self.pemeriksaan_path), index=False)
-    
+        if storage is None:
+            storage = ExcelStorage(excel_path, master_pasien_path)
+        self.storage = storage
+
     def tambah_pasien_baru_master(self, id_pasien, nik, nama, jenis_kelamin, tempat_lahir, tanggal_lahir, alamat, riwayat_penyakit, qr_code_path):
         tanggal_daftar = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
+
         pasien_baru = {
             'id_pasien': id_pasien,
             'nik': nik,
@@ -62,47 +53,54 @@ class Database:
             'tanggal_daftar_pertama': tanggal_daftar,
             'qr_code_path': qr_code_path
         }
-        
-        self.master_pasien = pd.concat([self.master_pasien, pd.DataFrame([pasien_baru])], ignore_index=True)
-        self.save_master_pasien()
+
+        self.storage.tambah('master', pasien_baru)
         return id_pasien
-    
-    def tambah_antrean_harian(self, id_pasien, poli, nomor_antrean):
-        master_data = self.master_pasien[self.master_pasien['id_pasien'] == id_pasien]
+
+    def tambah_antrean_harian(self, id_pasien, poli, nomor_antrean=None, prioritas=None):
+        """Mendaftarkan pasien ke antrean hari ini, mengembalikan kode antrean (None bila gagal)"""
+        master_data = self.storage.cari('master', id_pasien=id_pasien)
         if master_data.empty:
-            return False
-        
+            return None
+
         pasien_master = master_data.iloc[0]
+        if prioritas is None:
+            prioritas = tentukan_prioritas(pasien_master.get('tanggal_lahir'), poli)
         tanggal_hari_ini = datetime.date.today().strftime("%Y-%m-%d")
         waktu_daftar = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        antrean_baru = {
-            'id': id_pasien,
-            'nomor_antrean': nomor_antrean,
-            'nama': pasien_master['nama'],
-            'nik': pasien_master['nik'],
-            'tanggal': tanggal_hari_ini,
-            'status': 'menunggu',
-            'waktu_daftar': waktu_daftar,
-            'waktu_panggil': None,
-            'poli': poli
-        }
-        
-        self.data_pasien = pd.concat([self.data_pasien, pd.DataFrame([antrean_baru])], ignore_index=True)
-        self.save_data()
-        return True
-    
+        # Alokasi nomor dan penyimpanan dalam satu kunci agar terminal lain tidak mendapat nomor sama
+        with self.storage.transaksi():
+            if nomor_antrean is None:
+                nomor_antrean = self.storage.alokasi_nomor(tanggal_hari_ini, poli)
+            kode_antrean = buat_kode_antrean(poli, nomor_antrean)
+
+            antrean_baru = {
+                'id': id_pasien,
+                'nomor_antrean': nomor_antrean,
+                'nama': pasien_master['nama'],
+                'nik': pasien_master['nik'],
+                'tanggal': tanggal_hari_ini,
+                'status': 'menunggu',
+                'waktu_daftar': waktu_daftar,
+                'waktu_panggil': None,
+                'poli': poli,
+                'kode_antrean': kode_antrean,
+                'prioritas': prioritas
+            }
+
+            self.storage.tambah('antrean', antrean_baru)
+        return kode_antrean
+
     def update_status_pasien(self, id_pasien, status, waktu_panggil=None):
-        idx = self.data_pasien[self.data_pasien['id'] == id_pasien].index
-        if len(idx) > 0:
-            self.data_pasien.at[idx[0], 'status'] = status
-            if waktu_panggil:
-                self.data_pasien.at[idx[0], 'waktu_panggil'] = waktu_panggil
-            self.save_data()
-    
+        tanggal_hari_ini = datetime.date.today().strftime("%Y-%m-%d")
+        data = {'status': status}
+        if waktu_panggil:
+            data['waktu_panggil'] = waktu_panggil
+        self.storage.ubah('antrean', {'tanggal': tanggal_hari_ini, 'id': id_pasien}, data, semua=False)
+
     def simpan_data_pemeriksaan(self, data_pemeriksaan):
         id_pemeriksaan = str(uuid.uuid4())[:8]
-        master_data = self.master_pasien[self.master_pasien['id_pasien'] == data_pemeriksaan['id_pasien']]
+        master_data = self.storage.cari('master', id_pasien=data_pemeriksaan['id_pasien'])
         nama_pasien = master_data.iloc[0]['nama'] if not master_data.empty else 'Unknown'
         pemeriksaan_baru = {
             'id_pemeriksaan': id_pemeriksaan,
@@ -119,140 +117,188 @@ class Database:
             'catatan': data_pemeriksaan.get('catatan', ''),
             'waktu_periksa': data_pemeriksaan.get('waktu_periksa', '')
         }
-        
-        self.data_pemeriksaan = pd.concat([self.data_pemeriksaan, pd.DataFrame([pemeriksaan_baru])], ignore_index=True)
-        self.save_data_pemeriksaan()
+
+        self.storage.tambah('pemeriksaan', pemeriksaan_baru)
         return id_pemeriksaan
-    
+
     def get_data_pemeriksaan_by_pasien(self, id_pasien):
-        return self.data_pemeriksaan[self.data_pemeriksaan['id_pasien'] == id_pasien]
+        return self.storage.cari('pemeriksaan', id_pasien=id_pasien)
+
+    def get_pemeriksaan_terakhir(self, id_pasien):
+        """Pemeriksaan dengan waktu_periksa terbaru milik pasien (None bila belum pernah)"""
+        hasil = self.storage.cari_rentang('pemeriksaan', 'waktu_periksa', {'id_pasien': id_pasien},
+                                          batas=1, terbaru_dulu=True)
+        return None if hasil.empty else hasil.iloc[0]
+
+    def get_riwayat(self, id_pasien, dari=None, sampai=None, batas=None, lewati=0):
+        """Riwayat pemeriksaan pasien (terbaru dulu) antara tanggal dari..sampai, per halaman"""
+        return self.storage.cari_rentang('pemeriksaan', 'waktu_periksa', {'id_pasien': id_pasien},
+                                         dari=dari, sampai=sampai, lewati=lewati, batas=batas,
+                                         terbaru_dulu=True)
 
     def hapus_pasien(self, id_pasien):
         try:
-            idx = self.data_pasien[self.data_pasien['id'] == id_pasien].index
-            if len(idx) > 0:
-                self.data_pasien = self.data_pasien.drop(idx)
-                self.save_data()
-                return True
-            return False
+            return self.storage.hapus('antrean', {'id': id_pasien}) > 0
         except Exception as e:
             print(f"Error saat menghapus pasien: {e}")
             return False
-    
+
+    def hapus_pasien_total(self, id_pasien, qr_path=None, qr_generator=None):
+        """Menghapus antrean (termasuk arsip), pemeriksaan, master dan QR pasien sekaligus
+
+        Mengembalikan jumlah baris terhapus per tabel (plus 'qr'), atau None bila gagal
+        dan tidak ada yang berubah.
+        """
+        if qr_path is None:
+            master_data = self.storage.cari('master', id_pasien=id_pasien)
+            if not master_data.empty and pd.notna(master_data.iloc[0]['qr_code_path']):
+                qr_path = master_data.iloc[0]['qr_code_path']
+        qr_path = Path(qr_path) if qr_path else None
+
+        # File QR dipindah dulu agar bisa dikembalikan bila penghapusan data gagal
+        qr_sementara = None
+        if qr_path is not None and qr_path.exists():
+            qr_sementara = qr_path.with_name(f".{qr_path.name}.hapus")
+            try:
+                os.replace(qr_path, qr_sementara)
+            except OSError as e:
+                print(f"Error saat menghapus file QR Code: {e}")
+                return None
+
+        try:
+            jumlah = self.storage.hapus_sekaligus([
+                ('antrean', {'id': id_pasien}),
+                ('pemeriksaan', {'id_pasien': id_pasien}),
+                ('master', {'id_pasien': id_pasien})
+            ])
+        except Exception as e:
+            print(f"Error saat menghapus pasien: {e}")
+            if qr_sementara is not None:
+                os.replace(qr_sementara, qr_path)
+            return None
+
+        if qr_sementara is not None:
+            try:
+                qr_sementara.unlink()
+            except OSError as e:
+                print(f"Warning: File QR Code sementara tidak terhapus: {e}")
+        hasil = dict(zip(['antrean', 'pemeriksaan', 'master'], jumlah))
+        hasil['qr'] = qr_sementara is not None
+        # QR di paket baru dihapus setelah data pasien pasti terhapus
+        if qr_generator is not None:
+            try:
+                hasil['qr'] = qr_generator.hapus(id_pasien) or hasil['qr']
+            except Exception as e:
+                print(f"Warning: QR Code tidak terhapus dari paket: {e}")
+        return hasil
+
+    def lepas_path_qr_lama(self):
+        """Mengosongkan qr_code_path semua pasien setelah PNG lama dipindah ke paket QR"""
+        return self.storage.ubah('master', {}, {'qr_code_path': None})
+
     def cari_pasien_master(self, id_pasien=None, nik=None):
         if id_pasien:
-            return self.master_pasien[self.master_pasien['id_pasien'] == id_pasien]
+            return self.storage.cari('master', id_pasien=id_pasien)
         elif nik:
-            nik_str = str(nik).strip()
-            return self.master_pasien[self.master_pasien['nik'].str.strip() == nik_str]
+            return self.cari_pasien_by_nik(nik)
         return pd.DataFrame()
-    
+
     def cari_pasien_by_nik(self, nik):
         nik_str = str(nik).strip()
-        return self.master_pasien[self.master_pasien['nik'].str.strip() == nik_str]
-    
+        return self.storage.cari('master', nik=nik_str)
+
     def cari_pasien(self, id_pasien):
-        return self.data_pasien[self.data_pasien['id'] == id_pasien]
-    
+        """Baris antrean hari ini milik pasien (kosong bila belum daftar hari ini)"""
+        tanggal_hari_ini = datetime.date.today().strftime("%Y-%m-%d")
+        return self.storage.cari('antrean', tanggal=tanggal_hari_ini, id=id_pasien)
+
     def get_pasien_hari_ini(self):
         tanggal_hari_ini = datetime.date.today().strftime("%Y-%m-%d")
-        return self.data_pasien[self.data_pasien['tanggal'] == tanggal_hari_ini]
-    
-    def get_next_nomor_antrean(self):
+        return self.storage.cari('antrean', tanggal=tanggal_hari_ini)
+
+    def arsipkan_antrean_lama(self):
+        """Memindahkan antrean hari-hari sebelumnya ke arsip, dipanggil saat pergantian hari"""
         tanggal_hari_ini = datetime.date.today().strftime("%Y-%m-%d")
-        df_hari_ini = self.data_pasien[self.data_pasien['tanggal'] == tanggal_hari_ini]
-        
-        if df_hari_ini.empty:
-            return 1
-        return df_hari_ini['nomor_antrean'].max() + 1
-    
+        return self.storage.arsipkan_antrean(tanggal_hari_ini)
+
+    def get_riwayat_antrean(self, id_pasien=None, tanggal=None):
+        kriteria = {}
+        if id_pasien:
+            kriteria['id'] = id_pasien
+        if tanggal:
+            kriteria['tanggal'] = tanggal
+        return self.storage.cari_riwayat_antrean(**kriteria)
+
     def cek_pasien_sudah_antrean_hari_ini(self, id_pasien):
         tanggal_hari_ini = datetime.date.today().strftime("%Y-%m-%d")
-        existing = self.data_pasien[
-            (self.data_pasien['id'] == id_pasien) & 
-            (self.data_pasien['tanggal'] == tanggal_hari_ini)
-        ]
+        existing = self.storage.cari('antrean', tanggal=tanggal_hari_ini, id=id_pasien)
         return not existing.empty
-    
+
     def update_data_pasien(self, id_pasien, nama=None, nik=None):
         try:
-            idx = self.data_pasien[self.data_pasien['id'] == id_pasien].index
-            if len(idx) > 0:
-                if nama is not None:
-                    self.data_pasien.loc[idx, 'nama'] = nama
-                if nik is not None:
-                    self.data_pasien.loc[idx, 'nik'] = nik
-                self.save_data()
-                return True
-            return False
+            data = {}
+            if nama is not None:
+                data['nama'] = nama
+            if nik is not None:
+                data['nik'] = nik
+            return self.storage.ubah('antrean', {'id': id_pasien}, data) > 0
         except Exception as e:
             print(f"Error saat mengupdate data pasien: {e}")
             return False
 
     def update_data_master_pasien(self, id_pasien, **kwargs):
         try:
-            idx = self.master_pasien[self.master_pasien['id_pasien'] == id_pasien].index
-            if len(idx) > 0:
-                for field, value in kwargs.items():
-                    if field in self.master_pasien.columns and value is not None:
-                        self.master_pasien.loc[idx, field] = value
-                
-                self.save_master_pasien()
-                
+            data = {field: value for field, value in kwargs.items()
+                    if field in KOLOM['master'] and value is not None}
+            if self.storage.ubah('master', {'id_pasien': id_pasien}, data) > 0:
                 if 'nama' in kwargs or 'nik' in kwargs:
                     self.update_antrean_from_master(id_pasien)
-                
+
                 return True
             return False
         except Exception as e:
             print(f"Error saat mengupdate data master pasien: {e}")
             return False
-    
+
     def update_antrean_from_master(self, id_pasien):
         try:
-            master_data = self.master_pasien[self.master_pasien['id_pasien'] == id_pasien]
+            master_data = self.storage.cari('master', id_pasien=id_pasien)
             if not master_data.empty:
                 pasien_master = master_data.iloc[0]
-                
-                antrean_idx = self.data_pasien[self.data_pasien['id'] == id_pasien].index
-                if len(antrean_idx) > 0:
-                    self.data_pasien.loc[antrean_idx, 'nama'] = pasien_master['nama']
-                    self.data_pasien.loc[antrean_idx, 'nik'] = pasien_master['nik']
-                    self.save_data()
+                self.storage.ubah('antrean', {'id': id_pasien},
+                                  {'nama': pasien_master['nama'], 'nik': pasien_master['nik']})
         except Exception as e:
             print(f"Error saat update antrean from master: {e}")
 
     def hapus_master_pasien(self, id_pasien):
         try:
-            idx = self.master_pasien[self.master_pasien['id_pasien'] == id_pasien].index
-            if len(idx) > 0:
-                self.master_pasien = self.master_pasien.drop(idx)
-                self.save_master_pasien()
-                return True
-            return False
+            return self.storage.hapus('master', {'id_pasien': id_pasien}) > 0
         except Exception as e:
             print(f"Error saat menghapus master pasien: {e}")
             return False
 
     def hapus_data_pemeriksaan_pasien(self, id_pasien):
         try:
-            idx = self.data_pemeriksaan[self.data_pemeriksaan['id_pasien'] == id_pasien].index
-            if len(idx) > 0:
-                self.data_pemeriksaan = self.data_pemeriksaan.drop(idx)
-                self.save_data_pemeriksaan()
-                return True
-            return False
+            return self.storage.hapus('pemeriksaan', {'id_pasien': id_pasien}) > 0
         except Exception as e:
             print(f"Error saat menghapus data pemeriksaan: {e}")
             return False
 
+    def sinkronkan(self):
+        """Mengambil perubahan dari terminal lain; True bila ada yang berubah"""
+        return self.storage.sinkronkan()
+
+    def flush(self):
+        """Menyimpan permanen semua perubahan yang masih tertunda"""
+        self.storage.flush()
+
+    def tutup(self):
+        self.storage.tutup()
+        self._tertutup = True
+
     def __del__(self):
         try:
-            if hasattr(self, 'data_pasien') and self.data_pasien is not None:
-                self.save_data()
-            if hasattr(self, 'master_pasien') and self.master_pasien is not None:
-                self.save_master_pasien()
-            if hasattr(self, 'data_pemeriksaan') and self.data_pemeriksaan is not None:
-                self.save_data_pemeriksaan()
+            if hasattr(self, 'storage') and not getattr(self, '_tertutup', False):
+                self.storage.tutup()
         except Exception:
-            pass
\ No newline at end of file
+            pass
@@ -0,0 +1,109 @@
+import datetime
+import sys
+import time
+import uuid
+from pathlib import Path
+import pandas as pd
+from storage import ExcelStorage, SQLiteStorage, KOLOM
+
+JENIS_KELAMIN = {
+    'l': 'Laki-laki', 'laki-laki': 'Laki-laki', 'laki laki': 'Laki-laki', 'pria': 'Laki-laki',
+    'p': 'Perempuan', 'perempuan': 'Perempuan', 'wanita': 'Perempuan'
+}
+
+
+def baca_file(path):
+    """Membaca CSV/Excel data pasien; semua kolom sebagai teks agar NIK tidak berubah"""
+    if path.suffix.lower() in ('.xlsx', '.xls'):
+        df = pd.read_excel(str(path), dtype=str)
+    else:
+        df = pd.read_csv(str(path), dtype=str, keep_default_na=False)
+    df.columns = [str(k).strip().lower().replace(' ', '_') for k in df.columns]
+    return df
+
+
+def validasi(df, storage):
+    """Memisahkan baris valid dan ditolak (beserta alasannya) dengan operasi per kolom"""
+    df = df.copy()
+    for kolom in KOLOM['master']:
+        if kolom not in df.columns:
+            df[kolom] = ''
+        df[kolom] = df[kolom].fillna('').astype(str).str.strip()
+    # Nomor baris seperti terlihat di file (baris 1 = header)
+    df['baris'] = df.index + 2
+    alasan = pd.Series('', index=df.index)
+
+    def tolak(mask, pesan):
+        alasan[mask & (alasan == '')] = pesan
+
+    tolak(~df['nik'].str.fullmatch(r'\d{16}'), 'NIK harus 16 digit angka')
+    tolak(df['nama'] == '', 'Nama kosong')
+
+    tanggal = pd.to_datetime(df['tanggal_lahir'], format='%Y-%m-%d', errors='coerce')
+    tolak((df['tanggal_lahir'] != '') & tanggal.isna(), 'Format tanggal lahir salah (YYYY-MM-DD)')
+    tolak(tanggal > pd.Timestamp(datetime.date.today()), 'Tanggal lahir di masa depan')
+
+    jenis_kelamin = df['jenis_kelamin'].str.lower().map(JENIS_KELAMIN)
+    tolak((df['jenis_kelamin'] != '') & jenis_kelamin.isna(), 'Jenis kelamin tidak dikenal')
+    df['jenis_kelamin'] = jenis_kelamin
+
+    tolak(df['nik'].duplicated(keep='first'), 'NIK ganda dalam file')
+    terdaftar = storage.sudah_ada('master', 'nik', df.loc[alasan == '', 'nik'].tolist())
+    tolak(df['nik'].isin(terdaftar), 'NIK sudah terdaftar')
+
+    ditolak = df.loc[alasan != '', ['baris', 'nik', 'nama']].assign(alasan=alasan[alasan != ''])
+    valid = df.loc[alasan == '', KOLOM['master']].copy()
+    return valid, ditolak
+
+
+def impor_pasien(path, base_dir, buat_qr=False):
+    """Mengimpor data pasien dari CSV/Excel ke master pasien dalam satu penulisan"""
+    sqlite_path = base_dir / "antriobat.db"
+    if sqlite_path.exists():
+        storage = SQLiteStorage(sqlite_path)
+    else:
+        storage = ExcelStorage(base_dir / "antrean_harian.xlsx", base_dir / "master_pasien.xlsx")
+    try:
+        mulai = time.perf_counter()
+        df = baca_file(path)
+        if 'nik' not in df.columns or 'nama' not in df.columns:
+            print("File harus memiliki kolom 'nik' dan 'nama'.")
+            return None
+
+        valid, ditolak = validasi(df, storage)
+        valid['id_pasien'] = [str(uuid.uuid4()) for _ in range(len(valid))]
+        valid['tanggal_daftar_pertama'] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        valid['qr_code_path'] = None
+        if buat_qr:
+            # Diimpor di sini agar impor tanpa QR tidak butuh library kamera/QR
+            from qr_handler import QRGenerator
+            generator = QRGenerator(base_dir / "qr_codes.db")
+            try:
+                hasil_qr = generator.generate_batch(valid['id_pasien'])
+            finally:
+                generator.tutup()
+            if hasil_qr['gagal']:
+                print(f"⚠️  {len(hasil_qr['gagal'])} QR Code gagal dibuat")
+        valid = valid.replace('', None)
+        storage.tambah_banyak('master', valid)
+
+        print(f"✓ {len(valid)} pasien berhasil diimpor ({time.perf_counter() - mulai:.1f} detik)")
+        if not ditolak.empty:
+            laporan = path.with_name(f"{path.stem}_ditolak.csv")
+            ditolak.to_csv(laporan, index=False)
+            print(f"✗ {len(ditolak)} baris ditolak, lihat {laporan}")
+            for alasan, jumlah in ditolak['alasan'].value_counts().items():
+                print(f"  - {alasan}: {jumlah}")
+        return valid, ditolak
+    finally:
+        storage.tutup()
+
+
+if __name__ == "__main__":
+    argumen = [a for a in sys.argv[1:] if a != '--qr']
+    if not argumen:
+        print("Penggunaan: python impor_pasien.py <file.csv|file.xlsx> [folder_data] [--qr]")
+        sys.exit(1)
+    base_dir = Path(argumen[1]) if len(argumen) > 1 else Path("data")
+    base_dir.mkdir(exist_ok=True)
+    impor_pasien(Path(argumen[0]), base_dir, buat_qr='--qr' in sys.argv)
@@ -0,0 +1,112 @@
+from bisect import bisect_left, bisect_right, insort
+
+
+class IndeksHash:
+    """Index hash dari nilai kolom ke label baris DataFrame, diperbarui setiap mutasi"""
+
+    def __init__(self, kolom, normalisasi=None):
+        self.kolom = tuple(kolom)
+        self.normalisasi = normalisasi or {}
+        self._peta = {}
+
+    @property
+    def kolom_terkait(self):
+        """Kolom yang bila berubah membuat index perlu diperbarui"""
+        return self.kolom
+
+    def kunci(self, baris):
+        return tuple(
+            self.normalisasi[k](baris.get(k)) if k in self.normalisasi else baris.get(k)
+            for k in self.kolom
+        )
+
+    def bangun(self, df):
+        self._peta = {}
+        for label, baris in zip(df.index, df[list(self.kolom_terkait)].to_dict('records')):
+            self.tambah(label, baris)
+
+    def tambah(self, label, baris):
+        # Label tetap terurut agar "baris pertama" sama dengan urutan di DataFrame
+        insort(self._peta.setdefault(self.kunci(baris), []), label)
+
+    def hapus(self, label, baris):
+        kunci = self.kunci(baris)
+        labels = self._peta.get(kunci)
+        if labels and label in labels:
+            labels.remove(label)
+            if not labels:
+                del self._peta[kunci]
+
+    def salin_kunci(self, daftar_baris):
+        """Salinan isi index untuk kunci baris-baris tersebut, untuk pulihkan_kunci()"""
+        salinan = {}
+        for baris in daftar_baris:
+            kunci = self.kunci(baris)
+            if kunci not in salinan:
+                salinan[kunci] = list(self._peta.get(kunci, []))
+        return salinan
+
+    def pulihkan_kunci(self, salinan):
+        for kunci, isi in salinan.items():
+            if isi:
+                self._peta[kunci] = isi
+            else:
+                self._peta.pop(kunci, None)
+
+    def daftar_kunci(self):
+        return list(self._peta)
+
+    def cari(self, kriteria):
+        """Label baris (urut sesuai urutan masuk) yang cocok dengan kriteria"""
+        return list(self._peta.get(self.kunci(kriteria), []))
+
+
+class IndeksUrut(IndeksHash):
+    """Index hash yang label per kuncinya terurut menurut kolom lain (mis. waktu_periksa)"""
+
+    def __init__(self, kolom, kolom_urut, normalisasi=None):
+        super().__init__(kolom, normalisasi)
+        self.kolom_urut = kolom_urut
+
+    @property
+    def kolom_terkait(self):
+        return self.kolom + (self.kolom_urut,)
+
+    def nilai_urut(self, baris):
+        nilai = baris.get(self.kolom_urut)
+        if self.kolom_urut in self.normalisasi:
+            return self.normalisasi[self.kolom_urut](nilai)
+        return nilai
+
+    def tambah(self, label, baris):
+        insort(self._peta.setdefault(self.kunci(baris), []), (self.nilai_urut(baris), label))
+
+    def hapus(self, label, baris):
+        kunci = self.kunci(baris)
+        entri = self._peta.get(kunci)
+        if not entri:
+            return
+        item = (self.nilai_urut(baris), label)
+        i = bisect_left(entri, item)
+        if i < len(entri) and entri[i] == item:
+            del entri[i]
+            if not entri:
+                del self._peta[kunci]
+
+    def cari(self, kriteria):
+        return sorted(label for _, label in self._peta.get(self.kunci(kriteria), []))
+
+    def rentang(self, kriteria, dari=None, sampai=None, lewati=0, batas=None, terbaru_dulu=False):
+        """Label urut menurut kolom_urut dengan dari <= nilai <= sampai, per halaman lewati/batas"""
+        entri = self._peta.get(self.kunci(kriteria), [])
+        awal = 0 if dari is None else bisect_left(entri, (dari,))
+        akhir = len(entri) if sampai is None else bisect_right(entri, (sampai, float('inf')))
+        if terbaru_dulu:
+            akhir = max(awal, akhir - lewati)
+            if batas is not None:
+                awal = max(awal, akhir - batas)
+            return [label for _, label in reversed(entri[awal:akhir])]
+        awal = min(akhir, awal + lewati)
+        if batas is not None:
+            akhir = min(akhir, awal + batas)
+        return [label for _, label in entri[awal:akhir]]
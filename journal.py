@@ -0,0 +1,140 @@
+import json
+import os
+
+
+def _ke_json(nilai):
+    # numpy/pandas scalar (int64, float64, bool_) -> tipe Python biasa
+    if hasattr(nilai, 'item'):
+        return nilai.item()
+    return str(nilai)
+
+
+class Journal:
+    """Catatan append-only: satu baris JSON untuk setiap mutasi Database
+
+    Beberapa proses boleh menulis ke journal yang sama selama memegang kunci data.
+    ``offset`` adalah posisi byte journal utama yang sudah dibaca/ditulis proses ini,
+    ``generasi`` bertambah setiap kali journal dirotasi oleh kompaksi.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Journal yang sedang dikompaksi; dihapus setelah snapshot Excel selesai ditulis
+        self.path_lama = path.with_name(path.name + ".lama")
+        self.path_generasi = path.with_name(path.name + ".gen")
+        self.jumlah = 0
+        self.offset = 0
+        self._belum_sinkron = False
+
+    def catat(self, record, sinkron=True, bobot=1):
+        """Menulis record ke file; fsync langsung bila sinkron, atau menunggu sinkronkan()
+
+        ``bobot`` menambah ``jumlah`` (dasar keputusan kompaksi), mis. jumlah baris impor massal.
+        """
+        baris = json.dumps(record, default=_ke_json, ensure_ascii=False) + '\n'
+        # File tidak dibiarkan terbuka agar proses lain tetap bisa merotasi journal (Windows)
+        with open(self.path, 'ab') as f:
+            if os.fstat(f.fileno()).st_size != self.offset:
+                # Sisa baris terpotong dari proses yang mati saat menulis
+                baris = '\n' + baris
+            f.write(baris.encode('utf-8'))
+            f.flush()
+            if sinkron:
+                os.fsync(f.fileno())
+            else:
+                self._belum_sinkron = True
+            self.offset = os.fstat(f.fileno()).st_size
+        self.jumlah += bobot
+
+    def sinkronkan(self):
+        if not self._belum_sinkron:
+            return
+        self._belum_sinkron = False
+        try:
+            with open(self.path, 'r+b') as f:
+                os.fsync(f.fileno())
+        except FileNotFoundError:
+            # Sudah dirotasi proses lain
+            pass
+
+    def _baca_file(self, path, offset=0):
+        """Record utuh mulai dari offset, beserta posisi setelah baris utuh terakhir"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        records = []
+        posisi = offset
+        # Potongan terakhir tanpa '\n' belum selesai ditulis, dibaca lagi nanti
+        for baris in data.split(b'\n')[:-1]:
+            posisi += len(baris) + 1
+            baris = baris.strip()
+            if not baris:
+                continue
+            try:
+                records.append(json.loads(baris.decode('utf-8')))
+            except (ValueError, UnicodeDecodeError):
+                # Baris rusak karena aplikasi mati saat menulis
+                continue
+        return records, posisi
+
+    def baca(self):
+        """Membaca semua record yang belum dikompaksi ke snapshot Excel"""
+        records = []
+        if self.path_lama.exists():
+            records, _ = self._baca_file(self.path_lama)
+        self.offset = 0
+        if self.path.exists():
+            baru, self.offset = self._baca_file(self.path)
+            records.extend(baru)
+        self.jumlah = len(records)
+        return records
+
+    def baca_baru(self):
+        """Record yang ditulis proses lain sejak baca/catat terakhir"""
+        if not self.path.exists() or os.path.getsize(self.path) == self.offset:
+            return []
+        records, self.offset = self._baca_file(self.path, self.offset)
+        self.jumlah += len(records)
+        return records
+
+    def generasi(self):
+        try:
+            with open(self.path_generasi, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def rotasi(self):
+        """Memindahkan isi journal ke journal lama agar mutasi baru masuk file kosong"""
+        self.sinkronkan()
+        if self.path.exists():
+            if self.path_lama.exists():
+                # Kompaksi sebelumnya gagal: gabungkan agar tidak ada record yang hilang
+                with open(self.path_lama, 'ab') as dst, open(self.path, 'rb') as src:
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.path)
+            else:
+                os.replace(self.path, self.path_lama)
+        # Proses lain yang melihat generasi baru akan memuat ulang dari snapshot
+        generasi = self.naikkan_generasi()
+        self.jumlah = 0
+        self.offset = 0
+        return generasi
+
+    def naikkan_generasi(self):
+        """Menandai bahwa isi journal diganti sehingga offset proses lain tidak berlaku lagi"""
+        generasi = self.generasi() + 1
+        tmp_path = self.path_generasi.with_name(self.path_generasi.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(generasi))
+        os.replace(tmp_path, self.path_generasi)
+        return generasi
+
+    def hapus_lama(self):
+        if self.path_lama.exists():
+            os.remove(self.path_lama)
+
+    def tutup(self):
+        self.sinkronkan()
@@ -0,0 +1,83 @@
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class KunciFile:
+    """Kunci eksklusif antar-proses (dan antar-thread) lewat file, boleh dipakai bertingkat"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self.tingkat = 0
+        self._file = None
+
+    def acquire(self, blocking=True):
+        if not self._lock.acquire(blocking):
+            return False
+        if self.tingkat == 0:
+            try:
+                berhasil = self._kunci_os(blocking)
+            except Exception:
+                self._lock.release()
+                raise
+            if not berhasil:
+                self._lock.release()
+                return False
+        self.tingkat += 1
+        return True
+
+    def release(self):
+        self.tingkat -= 1
+        if self.tingkat == 0:
+            self._buka_os()
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def _kunci_os(self, blocking):
+        self._file = open(self.path, 'a+b')
+        try:
+            if fcntl is not None:
+                flag = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(self._file.fileno(), flag)
+                return True
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                    return True
+                except OSError:
+                    if not blocking:
+                        raise
+                    time.sleep(0.05)
+        except OSError:
+            if blocking:
+                self._file.close()
+                self._file = None
+                raise
+            # Dipegang proses lain
+            self._file.close()
+            self._file = None
+            return False
+
+    def _buka_os(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
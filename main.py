@@ -1,46 +1,89 @@
 import datetime
 from pathlib import Path
-from database import Database
-from qr_handler import QRGenerator, QRScanner
+from database import Database, PREFIX_POLI
+from storage import SQLiteStorage
+from schema import POLI
+from qr_handler import QRGenerator, QRScanner, SesiKamera
 from audio import AudioManager
 from ui import UI
 from antrean import AntreanManager
 from crud_handler import CRUDHandler
 
+PEMBUKA_PANGGILAN = "Perhatian, nomor antrean"
+PEMBUKA_PANGGILAN_ULANG = "Pengulangan panggilan. Nomor antrean"
+
+
 class SistemAntreanObat:
     def __init__(self):
         self.base_dir = Path("data")
         self.qr_dir = self.base_dir / "qr_codes"
+        # Ekspor PNG untuk dicetak; terpisah dari folder PNG lama yang diimpor ke paket
+        self.qr_cetak_dir = self.base_dir / "qr_cetak"
         self.excel_path = self.base_dir / "antrean_harian.xlsx"
         self.master_pasien_path = self.base_dir / "master_pasien.xlsx"
+        self.sqlite_path = self.base_dir / "antriobat.db"
         self.last_date_file = self.base_dir / "last_date.txt"
         self.base_dir.mkdir(exist_ok=True)
         self.qr_dir.mkdir(parents=True, exist_ok=True)
-        self.db = Database(self.excel_path, self.master_pasien_path)
-        self.antrean = AntreanManager()
-        self.qr_generator = QRGenerator()
+        # Database SQLite dipakai bila sudah dibuat lewat `python migrasi.py`
+        storage = SQLiteStorage(self.sqlite_path) if self.sqlite_path.exists() else None
+        self.db = Database(self.excel_path, self.master_pasien_path, storage)
+        self.antrean = AntreanManager(path_state=self.base_dir / "antrean_state.jsonl")
+        # Semua gambar QR disimpan dalam satu paket; PNG lama per pasien dipindah ke sana sekali
+        # saja, dan path lamanya di data master dikosongkan agar tidak menunjuk file yang hilang
+        self.qr_generator = QRGenerator(self.base_dir / "qr_codes.db")
+        dipindah = self.qr_generator.impor_folder(self.qr_dir)
+        if dipindah is not None:
+            self.db.lepas_path_qr_lama()
+            self.qr_generator.selesaikan_impor()
+            if dipindah:
+                print(f"✓ {dipindah} file QR Code lama dipindah ke paket QR")
         self.qr_scanner = QRScanner()
-        self.audio = AudioManager()
+        # Kamera baru dibuka saat scan pertama, lalu tetap siap di latar untuk scan berikutnya
+        self.kamera = SesiKamera(scanner=self.qr_scanner)
+        # Potongan pengumuman dirender sekali ke data/suara lalu tinggal disambung
+        self.audio = AudioManager(
+            self.base_dir / "suara",
+            frasa_tetap=[PEMBUKA_PANGGILAN, PEMBUKA_PANGGILAN_ULANG, "atas nama", "silakan ke",
+                         *PREFIX_POLI.values(), *POLI]
+        )
         self.ui = UI()  
         self.crud = CRUDHandler(self)
         self.check_and_auto_reset_daily()
-        self.initialize_daily_queue()
+        # Urutan antrean persis dipulihkan dari journal status; tabel antrean hanya bila tidak ada
+        if not self.antrean.pulihkan():
+            self.initialize_daily_queue()
     
     def _handle_patient_not_found(self, id_pasien):
         print(f"\nError: Data pasien {id_pasien} tidak ditemukan!")
         input("\nTekan Enter untuk kembali ke menu...")
         return None
     
+    def _umumkan(self, pembuka, pasien, kunci, ulang=False):
+        nomor = self.ui.ucapan_nomor(pasien)
+        nama = pasien['nama']
+        poli = pasien.get('poli', 'Poli')
+        self.audio.speak_async(
+            f"{pembuka} {nomor}, atas nama {nama}, silakan ke {poli}",
+            kunci=kunci, ulang=ulang,
+            bagian=[pembuka, *nomor.split(), "atas nama", nama, "silakan ke", poli]
+        )
+
     def panggil_pasien(self):
-        id_pasien = self.antrean.panggil_berikutnya()
-        
+        jumlah = {poli: self.antrean.jumlah_menunggu(poli) for poli in POLI}
+        poli = self.ui.pilih_poli_panggilan(jumlah)
+        # Antrean terminal lain diputar ulang, lalu pasien diambil dan statusnya dicatat tanpa
+        # bisa diselingi terminal lain, sehingga pasien yang sama tidak dipanggil dua kali
+        with self.antrean.transaksi():
+            id_pasien = self.antrean.panggil_berikutnya(poli=poli)
+            if id_pasien is not None:
+                waktu_panggil = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.db.update_status_pasien(id_pasien, 'terpanggil', waktu_panggil)
+
         if id_pasien is None:
-            print("\nTidak ada pasien dalam antrean!")
+            print(f"\nTidak ada pasien dalam antrean{' ' + poli if poli else ''}!")
             input("\nTekan Enter untuk kembali ke menu...")
             return
-        
-        waktu_panggil = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        self.db.update_status_pasien(id_pasien, 'terpanggil', waktu_panggil)
 
         hasil_pasien = self.db.cari_pasien(id_pasien)
         if hasil_pasien.empty:
@@ -50,8 +93,8 @@ class SistemAntreanObat:
         nama = pasien['nama']
         poli = pasien.get('poli', 'Poli')
         
-        self.ui.tampilkan_pemanggilan(pasien['nomor_antrean'], nama, waktu_panggil, poli)
-        self.audio.speak(f"Perhatian, nomor antrean {pasien['nomor_antrean']}, atas nama {nama}, silakan ke {poli}")
+        self.ui.tampilkan_pemanggilan(self.ui.format_nomor(pasien), nama, waktu_panggil, poli)
+        self._umumkan(PEMBUKA_PANGGILAN, pasien, kunci=id_pasien)
         
         input("\nTekan Enter untuk kembali ke menu...")
     
@@ -74,7 +117,7 @@ class SistemAntreanObat:
             pasien = self.db.cari_pasien(id_p)
             if not pasien.empty:
                 p = pasien.iloc[0]
-                waktu_panggil = p['waktu_panggil'] if 'waktu_panggil' in p else '-'
+                waktu_panggil = self.ui.format_waktu(p.get('waktu_panggil'))
                 print(f"{i:<5}{waktu_panggil:<25}{p['nama']:<30}")  
                 daftar_terpanggil.append(p['id'])
 
@@ -91,12 +134,12 @@ class SistemAntreanObat:
                     
                 pasien = hasil_pasien.iloc[0]
                 nama = pasien['nama']
-                nomor = pasien['nomor_antrean']
+                nomor = self.ui.format_nomor(pasien)
                 poli = pasien.get('poli', 'Poli')
-                waktu_panggil = pasien.get('waktu_panggil', 'Tidak tersedia')
+                waktu_panggil = self.ui.format_waktu(pasien.get('waktu_panggil'))
 
                 self.ui.tampilkan_pemanggilan(nomor, nama, waktu_panggil, poli, is_ulang=True)
-                self.audio.speak(f"Pengulangan panggilan. Nomor antrean {nomor}, atas nama {nama}, silakan ke {poli}")
+                self._umumkan(PEMBUKA_PANGGILAN_ULANG, pasien, kunci=id_pasien, ulang=True)
             else:
                 print("\nNomor tidak valid!")
         except ValueError:
@@ -123,7 +166,7 @@ class SistemAntreanObat:
             pasien = self.db.cari_pasien(id_p)
             if not pasien.empty:
                 p = pasien.iloc[0]
-                waktu_panggil = p.get('waktu_panggil', '-')
+                waktu_panggil = self.ui.format_waktu(p.get('waktu_panggil'))
                 status = p.get('status', 'terpanggil')
                 print(f"{i:<5}{waktu_panggil:<25}{p['nama']:<30}{status:<10}")
                 daftar_terpanggil.append(p['id'])
@@ -209,7 +252,7 @@ class SistemAntreanObat:
         
         daftar_pasien = []
         for i, (_, pasien) in enumerate(pasien_diperiksa.iterrows(), 1):
-            waktu = pasien.get('waktu_panggil', '-')[:16] if pasien.get('waktu_panggil') else '-'
+            waktu = self.ui.format_waktu(pasien.get('waktu_panggil'), "%Y-%m-%d %H:%M")
             poli = pasien.get('poli', '-')
             nik = pasien.get('nik', '-')
             print(f"{i:<5}{pasien['nama']:<25}{nik:<20}{poli:<15}{waktu:<15}")
@@ -238,13 +281,12 @@ class SistemAntreanObat:
         
         print(f"\n=== PEMBERIAN OBAT: {pasien['nama']} ===\n")
 
-        data_pemeriksaan = self.db.get_data_pemeriksaan_by_pasien(id_pasien)
-        if not data_pemeriksaan.empty:
-            pemeriksaan_terakhir = data_pemeriksaan.iloc[-1]
+        pemeriksaan_terakhir = self.db.get_pemeriksaan_terakhir(id_pasien)
+        if pemeriksaan_terakhir is not None:
             
             print("📋 DATA PEMERIKSAAN DOKTER:")
             print("-" * 50)
-            print(f"Tanggal Pemeriksaan: {pemeriksaan_terakhir.get('tanggal_pemeriksaan', '-')}")
+            print(f"Tanggal Pemeriksaan: {self.ui.format_waktu(pemeriksaan_terakhir.get('tanggal_pemeriksaan'), '%Y-%m-%d')}")
             print(f"Keluhan: {pemeriksaan_terakhir.get('keluhan', '-')}")
             print(f"Diagnosis: {pemeriksaan_terakhir.get('diagnosis', '-')}")
             print(f"Tindakan: {pemeriksaan_terakhir.get('tindakan', '-')}")
@@ -354,6 +396,15 @@ class SistemAntreanObat:
                 self.antrean.reset()
                 
                 print("✅ Nomor antrean berhasil direset untuk hari baru!")
+
+            try:
+                jumlah_arsip = self.db.arsipkan_antrean_lama()
+                if jumlah_arsip:
+                    print(f"📦 {jumlah_arsip} data antrean sebelumnya dipindahkan ke arsip")
+            except Exception as e:
+                print(f"Warning: Gagal mengarsipkan antrean lama: {e}")
+
+            if tanggal_terakhir is not None:
                 print("📝 Data antrean sebelumnya tetap tersimpan di database")
                 print("="*60)
 
@@ -367,16 +418,33 @@ class SistemAntreanObat:
         df_hari_ini = self.db.get_pasien_hari_ini()
         
         menunggu = df_hari_ini[df_hari_ini['status'] == 'menunggu']
-        terpanggil = df_hari_ini[df_hari_ini['status'] == 'terpanggil']
+        terpanggil = df_hari_ini[df_hari_ini['status'] == 'terpanggil'].sort_values('waktu_panggil', kind='stable')
+        info = {
+            baris.id: (baris.poli, baris.prioritas, baris.waktu_daftar)
+            for baris in menunggu[['id', 'poli', 'prioritas', 'waktu_daftar']].itertuples(index=False)
+        }
         
         self.antrean.initialize_from_data(
             menunggu['id'].tolist(),
-            terpanggil['id'].tolist()
+            terpanggil['id'].tolist(),
+            info
         )
     
+    def tutup(self):
+        # Panggilan yang masih antre diselesaikan dulu sebelum aplikasi ditutup
+        self.audio.tutup()
+        self.kamera.tutup()
+        self.db.tutup()
+        self.qr_generator.tutup()
+
     def jalankan(self):
         while True:
             self.check_and_auto_reset_daily()
+            # Terminal lain (pendaftaran/dokter/farmasi) mungkin mengubah antrean; operasinya
+            # diputar ulang dari journal status, tabel hanya dipakai bila journal hilang/rusak
+            self.db.sinkronkan()
+            if not self.antrean.sinkronkan():
+                self.initialize_daily_queue()
             
             self.ui.tampilkan_banner(
                 len(self.antrean.antrean_aktif),
@@ -414,12 +482,14 @@ class SistemAntreanObat:
             elif choice == '0':
                 print("\nTerima kasih telah menggunakan Sistem Antrean Pengambilan Obat")
                 print("Aplikasi akan ditutup...")
+                self.tutup()
                 break
             else:
                 print("\nPilihan tidak valid! Silakan pilih menu 0-13")
                 input("\nTekan Enter untuk melanjutkan...")
 
 if __name__ == "__main__":
+    sistem_antrean = None
     try:
         sistem_antrean = SistemAntreanObat()
         sistem_antrean.jalankan()
@@ -428,4 +498,8 @@ if __name__ == "__main__":
         print("\nPastikan semua library terinstal dengan menjalankan:")
         print("pip install -r requirements.txt")
     except Exception as e:
-        print(f"Error tak terduga: {e}")
\ No newline at end of file
+        print(f"Error tak terduga: {e}")
+    finally:
+        # Kamera harus dilepas walau aplikasi berhenti karena error
+        if sistem_antrean is not None:
+            sistem_antrean.kamera.tutup()
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+from storage import ExcelStorage, SQLiteStorage, KOLOM
+
+
+def migrasi_excel_ke_sqlite(base_dir):
+    """Mengimpor semua file Excel (plus journal yang belum dikompaksi) ke antriobat.db"""
+    excel = ExcelStorage(base_dir / "antrean_harian.xlsx", base_dir / "master_pasien.xlsx")
+    sqlite = SQLiteStorage(base_dir / "antriobat.db")
+    try:
+        for tabel in KOLOM:
+            if sqlite.jumlah_baris(tabel) > 0:
+                print(f"Tabel '{tabel}' di database SQLite sudah berisi data, migrasi dibatalkan.")
+                return False
+
+        for tabel in KOLOM:
+            df = excel.semua(tabel)
+            sqlite.tambah_banyak(tabel, df)
+            print(f"✓ {len(df)} baris '{tabel}' berhasil diimpor")
+        return True
+    finally:
+        sqlite.tutup()
+        excel.tutup()
+
+
+if __name__ == "__main__":
+    base_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("data")
+    if migrasi_excel_ke_sqlite(base_dir):
+        print(f"\nMigrasi selesai. Aplikasi akan memakai {base_dir / 'antriobat.db'} mulai sekarang.")
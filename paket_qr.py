@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+
+
+class PaketQR:
+    """Semua gambar QR pasien dalam satu file SQLite (kolom BLOB) dengan kunci id_pasien
+
+    Menggantikan satu file PNG per pasien di data/qr_codes: folder tidak terus membengkak
+    dan tidak ada path yang basi bila folder data dipindah.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Dipakai bersama oleh beberapa terminal, seperti SQLiteStorage
+        self.conn = sqlite3.connect(str(path), timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS qr ("
+                "id_pasien TEXT PRIMARY KEY, sidik TEXT NOT NULL, png BLOB NOT NULL)"
+            )
+            # Penanda sekali-jalan, mis. impor folder PNG lama yang sudah selesai
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (kunci TEXT PRIMARY KEY, nilai TEXT)")
+
+    def ambil(self, id_pasien):
+        """(sidik, bytes PNG) pasien, atau None bila belum ada"""
+        with self._lock:
+            baris = self.conn.execute(
+                "SELECT sidik, png FROM qr WHERE id_pasien = ?", (str(id_pasien),)
+            ).fetchone()
+        return (baris[0], bytes(baris[1])) if baris else None
+
+    def simpan_banyak(self, daftar):
+        """Menyimpan banyak (id_pasien, sidik, png) dalam satu transaksi"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO qr (id_pasien, sidik, png) VALUES (?, ?, ?)",
+                [(str(i), sidik, sqlite3.Binary(png)) for i, sidik, png in daftar]
+            )
+
+    def simpan(self, id_pasien, sidik, png):
+        self.simpan_banyak([(id_pasien, sidik, png)])
+
+    def sidik(self):
+        """id_pasien -> sidik untuk semua QR, tanpa membaca gambarnya"""
+        with self._lock:
+            return dict(self.conn.execute("SELECT id_pasien, sidik FROM qr"))
+
+    def hapus(self, id_pasien):
+        with self._lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM qr WHERE id_pasien = ?", (str(id_pasien),))
+        return cursor.rowcount > 0
+
+    def meta(self, kunci):
+        with self._lock:
+            baris = self.conn.execute("SELECT nilai FROM meta WHERE kunci = ?", (kunci,)).fetchone()
+        return baris[0] if baris else None
+
+    def simpan_meta(self, kunci, nilai):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (kunci, nilai) VALUES (?, ?)", (kunci, str(nilai)))
+
+    def impor_folder(self, qr_dir, sidik_qr, hapus_file=True):
+        """Memindahkan PNG lama (satu file per pasien) ke dalam paket; mengembalikan jumlahnya"""
+        daftar = []
+        for path in sorted(qr_dir.glob("*.png")):
+            if path.name.endswith(".tmp.png"):
+                continue
+            with open(path, 'rb') as f:
+                daftar.append((path.stem, sidik_qr(path.stem), f.read()))
+        if not daftar:
+            return 0
+        self.simpan_banyak(daftar)
+        # File baru dihapus setelah isinya pasti tersimpan di paket
+        if hapus_file:
+            for id_pasien, _, _ in daftar:
+                try:
+                    os.remove(qr_dir / f"{id_pasien}.png")
+                except OSError:
+                    pass
+            try:
+                os.remove(qr_dir / ".manifest.json")
+            except OSError:
+                pass
+        return len(daftar)
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM qr").fetchone()[0]
+
+    def tutup(self):
+        self.conn.close()
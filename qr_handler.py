@@ -1,63 +1,614 @@
 import qrcode
 import cv2
-from pyzbar.pyzbar import decode
+from pyzbar.pyzbar import decode, ZBarSymbol
 import numpy as np
 from PIL import Image
+import datetime
+import hashlib
+import io
 import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from paket_qr import PaketQR
+
+# Naikkan bila desain kartu QR berubah agar semua file dibuat ulang
+VERSI_DESAIN = 1
+# Lebar maksimum gambar yang dikirim ke pyzbar sebelum mencoba resolusi penuh
+LEBAR_DEKODE = 640
+
+
+def sidik_qr(data):
+    return hashlib.sha1(f"{VERSI_DESAIN}|{data}".encode('utf-8')).hexdigest()
+
+
+def _png_qr(data):
+    buffer = io.BytesIO()
+    qrcode.make(data).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _render_qr(data):
+    """Dijalankan di proses pekerja: membuat satu PNG di memori, mengembalikan (data, sidik, png, error)"""
+    try:
+        return data, sidik_qr(data), _png_qr(data), None
+    except Exception as e:
+        return data, None, None, str(e)
+
+
+def _tampilkan_progres(selesai, total):
+    lebar = 30
+    isi = int(lebar * selesai / total) if total else lebar
+    sys.stdout.write(f"\rMembuat QR Code [{'#' * isi}{'.' * (lebar - isi)}] {selesai}/{total}")
+    if selesai == total:
+        sys.stdout.write("\n")
+    sys.stdout.flush()
+
 
 class QRGenerator:
-    def generate_qr_code(self, data, save_path):
-        img = qrcode.make(data)
-        img.save(save_path)
+    # Di bawah jumlah ini pembuatan berurutan lebih cepat daripada menyalakan process pool
+    BATAS_SERIAL = 20
+    # Jumlah gambar QR terakhir yang disimpan di memori
+    UKURAN_CACHE = 256
+    # Hasil process pool ditulis ke paket per potongan agar memori tetap kecil
+    UKURAN_POTONGAN = 500
+
+    def __init__(self, paket_path=None):
+        self.paket = PaketQR(paket_path) if paket_path is not None else None
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cache_simpan(self, id_pasien, png):
+        with self._lock:
+            self._cache[id_pasien] = png
+            self._cache.move_to_end(id_pasien)
+            while len(self._cache) > self.UKURAN_CACHE:
+                self._cache.popitem(last=False)
+
+    def png_qr(self, id_pasien):
+        """Bytes PNG QR pasien: dari cache, lalu paket, dan baru dibuat bila belum ada/usang"""
+        id_pasien = str(id_pasien)
+        with self._lock:
+            png = self._cache.get(id_pasien)
+            if png is not None:
+                self._cache.move_to_end(id_pasien)
+                return png
+        tersimpan = self.paket.ambil(id_pasien) if self.paket is not None else None
+        if tersimpan is not None and tersimpan[0] == sidik_qr(id_pasien):
+            png = tersimpan[1]
+        else:
+            png = _png_qr(id_pasien)
+            if self.paket is not None:
+                self.paket.simpan(id_pasien, sidik_qr(id_pasien), png)
+        self._cache_simpan(id_pasien, png)
+        return png
+
+    def generate_qr_code(self, data, save_path=None):
+        """Membuat (ulang) QR ke paket; ``save_path`` opsional untuk ekspor file yang akan dicetak"""
+        data = str(data)
+        png = _png_qr(data)
+        if self.paket is not None:
+            self.paket.simpan(data, sidik_qr(data), png)
+        self._cache_simpan(data, png)
+        if save_path is None:
+            return png
+        return self.simpan_ke_file(data, save_path)
+
+    def simpan_ke_file(self, id_pasien, save_path):
+        png = self.png_qr(id_pasien)
+        tmp_path = f"{save_path}.tmp.png"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, save_path)
         return save_path
-    
-    def show_qr_code(self, qr_path):
-        if os.path.exists(qr_path):
-            img = Image.open(qr_path)
-            img.show()
+
+    def hapus(self, id_pasien):
+        """Menghapus QR pasien dari cache dan paket; True bila ada yang terhapus"""
+        id_pasien = str(id_pasien)
+        with self._lock:
+            self._cache.pop(id_pasien, None)
+        return self.paket.hapus(id_pasien) if self.paket is not None else False
+
+    def impor_folder(self, qr_dir):
+        """Memindahkan PNG lama per pasien di ``qr_dir`` ke dalam paket
+
+        Mengembalikan jumlah file yang dipindah, atau None bila impor sudah pernah
+        diselesaikan (lihat ``selesaikan_impor``) sehingga folder tidak disentuh lagi.
+        """
+        if self.paket is None or self.paket.meta('impor_folder') is not None:
+            return None
+        qr_dir = Path(qr_dir)
+        if not qr_dir.is_dir():
+            return 0
+        return self.paket.impor_folder(qr_dir, sidik_qr)
+
+    def selesaikan_impor(self):
+        """Menandai impor PNG lama selesai, setelah path lama di data pasien dibereskan"""
+        if self.paket is not None:
+            self.paket.simpan_meta('impor_folder', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+    def generate_batch(self, daftar_id, paksa=False, pekerja=None, progres=_tampilkan_progres):
+        """Membuat QR Code banyak pasien sekaligus di beberapa proses, langsung ke paket
+
+        QR yang sudah ada di paket dengan isi dan desain yang sama dilewati kecuali ``paksa``.
+        Mengembalikan dict berisi 'dibuat' (list id), 'dilewati' (jumlah) dan 'gagal' (id -> pesan).
+        """
+        if self.paket is None:
+            raise ValueError("QRGenerator tanpa paket QR tidak bisa membuat QR massal")
+        tersimpan = {} if paksa else self.paket.sidik()
+        hasil = {'dibuat': [], 'dilewati': 0, 'gagal': {}}
+
+        tugas = []
+        for id_pasien in dict.fromkeys(str(i) for i in daftar_id):
+            if tersimpan.get(id_pasien) == sidik_qr(id_pasien):
+                hasil['dilewati'] += 1
+                continue
+            tugas.append(id_pasien)
+
+        if len(tugas) <= self.BATAS_SERIAL:
+            keluaran = map(_render_qr, tugas)
+            executor = None
         else:
-            raise FileNotFoundError(f"File QR code tidak ditemukan: {qr_path}")
+            executor = ProcessPoolExecutor(max_workers=pekerja)
+            keluaran = executor.map(_render_qr, tugas, chunksize=max(1, len(tugas) // 64))
+        potongan = []
+        try:
+            for selesai, (id_pasien, sidik, png, error) in enumerate(keluaran, 1):
+                if error:
+                    hasil['gagal'][id_pasien] = error
+                else:
+                    potongan.append((id_pasien, sidik, png))
+                    hasil['dibuat'].append(id_pasien)
+                    with self._lock:
+                        self._cache.pop(id_pasien, None)
+                if len(potongan) >= self.UKURAN_POTONGAN:
+                    self.paket.simpan_banyak(potongan)
+                    potongan = []
+                # Cukup sekitar 100 kali pembaruan progres, berapa pun jumlah tugasnya
+                if progres and (selesai == len(tugas) or selesai % max(1, len(tugas) // 100) == 0):
+                    progres(selesai, len(tugas))
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if potongan:
+                self.paket.simpan_banyak(potongan)
+        return hasil
+
+    def regenerate_semua(self, daftar_id=None, paksa=True, pekerja=None):
+        """Membuat ulang QR di paket (default: semua pasien yang sudah punya QR)"""
+        if daftar_id is None:
+            daftar_id = sorted(self.paket.sidik())
+        return self.generate_batch(daftar_id, paksa=paksa, pekerja=pekerja)
+
+    def show_qr_code(self, qr):
+        """Menampilkan QR dari id pasien (lewat cache/paket), bytes PNG, atau path file lama"""
+        if isinstance(qr, bytes):
+            png = qr
+        elif isinstance(qr, Path) or os.path.exists(str(qr)):
+            if not os.path.exists(qr):
+                raise FileNotFoundError(f"File QR code tidak ditemukan: {qr}")
+            Image.open(qr).show()
+            return
+        else:
+            png = self.png_qr(qr)
+        Image.open(io.BytesIO(png)).show()
+
+    def tutup(self):
+        if self.paket is not None:
+            self.paket.tutup()
+
+def _dekode_skala(abu, lebar_maks, x0=0, y0=0):
+    tinggi, lebar = abu.shape[:2]
+    skala = min(1.0, lebar_maks / lebar) if lebar_maks else 1.0
+    if skala < 1.0:
+        abu = cv2.resize(abu, (int(lebar * skala), int(tinggi * skala)), interpolation=cv2.INTER_AREA)
+    return [
+        (obj.data.decode('utf-8'), [(int(p.x / skala) + x0, int(p.y / skala) + y0) for p in obj.polygon])
+        for obj in decode(abu, symbols=[ZBarSymbol.QRCODE])
+    ]
+
+
+def dekode_frame(frame, lebar_maks=LEBAR_DEKODE, roi=None):
+    """Mencari QR di frame: abu-abu, diperkecil dan (bila ada) di ROI dulu, lalu resolusi penuh
+
+    Mengembalikan list (data, polygon) dengan koordinat frame asli.
+    """
+    abu = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    if roi is not None:
+        x, y, w, h = roi
+        potongan = abu[y:y + h, x:x + w]
+        if potongan.size:
+            hasil = _dekode_skala(potongan, lebar_maks, x, y)
+            if hasil:
+                return hasil
+    hasil = _dekode_skala(abu, lebar_maks)
+    if not hasil and lebar_maks and abu.shape[1] > lebar_maks:
+        # QR kecil/jauh bisa hilang saat diperkecil
+        hasil = _dekode_skala(abu, None)
+    return hasil
+
+
+def roi_dari(polygon, bentuk, margin=0.5):
+    """Kotak di sekitar QR terakhir (diperlebar ``margin``) untuk dicari lebih dulu di frame berikutnya"""
+    xs = [p[0] for p in polygon]
+    ys = [p[1] for p in polygon]
+    lebar, tinggi = max(xs) - min(xs), max(ys) - min(ys)
+    x = max(0, int(min(xs) - lebar * margin))
+    y = max(0, int(min(ys) - tinggi * margin))
+    return x, y, min(bentuk[1] - x, int(lebar * (1 + 2 * margin))), min(bentuk[0] - y, int(tinggi * (1 + 2 * margin)))
+
+
+class PekerjaDekode(threading.Thread):
+    """Thread dekode terpisah dari loop kamera/tampilan
+
+    Hanya satu frame yang diproses sekaligus; frame yang datang saat pekerja sibuk dilewati,
+    sehingga lambatnya pyzbar tidak menurunkan frame rate preview.
+    """
+
+    def __init__(self, lebar_maks=LEBAR_DEKODE):
+        super().__init__(daemon=True)
+        self.lebar_maks = lebar_maks
+        self._frame = None
+        self._ada_frame = threading.Event()
+        self._lock = threading.Lock()
+        self._berhenti = False
+        self._roi = None
+        self._hasil = []
+
+    def kirim(self, frame):
+        """Menyerahkan frame untuk didekode; False bila pekerja masih sibuk (frame dilewati)"""
+        if self._ada_frame.is_set():
+            return False
+        # Pekerja mendapat salinan abu-abu sendiri: frame aslinya masih digambari overlay
+        # oleh loop tampilan selama dekode berjalan
+        self._frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame.copy()
+        self._ada_frame.set()
+        return True
+
+    def ambil(self):
+        """Hasil dekode terbaru (list (data, polygon)), lalu dikosongkan"""
+        with self._lock:
+            hasil, self._hasil = self._hasil, []
+        return hasil
+
+    def run(self):
+        while True:
+            self._ada_frame.wait()
+            if self._berhenti:
+                return
+            frame = self._frame
+            try:
+                hasil = dekode_frame(frame, self.lebar_maks, self._roi)
+            except Exception as e:
+                print(f"Error saat dekode QR: {e}")
+                hasil = []
+            self._roi = roi_dari(hasil[0][1], frame.shape) if hasil and hasil[0][1] else None
+            if hasil:
+                with self._lock:
+                    self._hasil = hasil
+            self._ada_frame.clear()
+            if self._berhenti:
+                return
+
+    def berhenti(self):
+        self._berhenti = True
+        self._ada_frame.set()
+        self.join(timeout=1)
+
+
+EKSTENSI_GAMBAR = ('.png', '.jpg', '.jpeg', '.bmp', '.webp', '.tif', '.tiff')
+
+
+class SumberKamera:
+    """Kamera langsung; frame yang lewat saat dekode dibuang (dekode di thread pekerja)"""
+    langsung = True
+
+    def __init__(self, indeks=0):
+        self.cap = cv2.VideoCapture(indeks)
+        if not self.cap.isOpened():
+            raise OSError("Tidak dapat membuka kamera!")
+        # Frame lama di buffer driver hanya menambah jeda
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    def baca(self):
+        return self.cap.read()
+
+    def tutup(self):
+        self.cap.release()
+
+
+class SumberVideo(SumberKamera):
+    """File video; setiap frame didekode berurutan"""
+    langsung = False
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(str(path))
+        if not self.cap.isOpened():
+            raise OSError(f"Video tidak bisa dibuka: {path}")
+
+
+class SumberFolder:
+    """Satu file gambar atau semua gambar dalam folder (urut nama)"""
+    langsung = False
+
+    def __init__(self, path):
+        path = Path(path)
+        if path.is_dir():
+            self.daftar = [p for p in sorted(path.iterdir()) if p.suffix.lower() in EKSTENSI_GAMBAR]
+        else:
+            self.daftar = [path]
+        self._iter = iter(self.daftar)
+
+    def baca(self):
+        for path in self._iter:
+            frame = cv2.imread(str(path))
+            if frame is not None:
+                return True, frame
+            print(f"Warning: Gambar tidak bisa dibaca: {path}")
+        return False, None
+
+    def tutup(self):
+        pass
+
+
+class SesiKamera:
+    """Kamera yang tetap terbuka di antara beberapa scan (membuka kamera bisa makan 1-3 detik)
+
+    Kamera baru dibuka saat scan pertama, sehingga terminal yang tidak pernah scan tidak
+    memakainya. Dengan ``latar`` kamera dibaca terus oleh thread latar sehingga saat scan
+    frame terbaru langsung tersedia; ``lepas_setelah`` (opsional) melepasnya lagi setelah
+    sekian detik tanpa scan. Dipakai sebagai sumber untuk ``QRScanner.pindai``.
+    """
+    langsung = True
+    # Batas menunggu kamera selesai dibuka, sebelum batas per frame berlaku
+    WAKTU_BUKA = 15
+
+    def __init__(self, indeks=0, scanner=None, latar=True, lepas_setelah=None):
+        self.indeks = indeks
+        self.scanner = scanner or QRScanner()
+        self.latar = latar
+        self.lepas_setelah = lepas_setelah
+        self._kamera = None
+        self._thread = None
+        self._berjalan = False
+        self._siap = False
+        self._berhenti = False
+        self._kondisi = threading.Condition()
+        self._frame = None
+        self._nomor = 0
+        self._nomor_dibaca = 0
+        self._aktif = False
+        self._terakhir_dipakai = time.monotonic()
+        self._error = None
+
+    def _buka(self):
+        if self._kamera is None:
+            self._kamera = SumberKamera(self.indeks)
+        return self._kamera
+
+    def _mulai_latar(self):
+        with self._kondisi:
+            if self._berjalan:
+                return
+            self._berjalan = True
+            self._berhenti = False
+            self._error = None
+            self._thread = threading.Thread(target=self._jalankan_latar, daemon=True)
+            self._thread.start()
+
+    def _jalankan_latar(self):
+        try:
+            kamera = self._buka()
+            with self._kondisi:
+                self._siap = True
+                self._kondisi.notify_all()
+            while not self._berhenti:
+                if (self.lepas_setelah is not None and not self._aktif
+                        and time.monotonic() - self._terakhir_dipakai > self.lepas_setelah):
+                    with self._kondisi:
+                        # Diputuskan di bawah kunci agar scan yang baru mulai membuka thread baru
+                        if not self._aktif:
+                            self._tutup_kamera()
+                            self._siap = False
+                            self._berjalan = False
+                            return
+                if self._aktif:
+                    ret, frame = kamera.baca()
+                else:
+                    # Tanpa scan cukup grab() agar buffer tetap segar tanpa biaya konversi frame
+                    ret, frame = kamera.cap.grab(), None
+                if not ret:
+                    raise OSError("Tidak dapat membaca frame dari kamera!")
+                if frame is not None:
+                    with self._kondisi:
+                        self._frame = frame
+                        self._nomor += 1
+                        self._kondisi.notify_all()
+        except Exception as e:
+            with self._kondisi:
+                self._error = e
+                self._kondisi.notify_all()
+        with self._kondisi:
+            self._tutup_kamera()
+            self._siap = False
+            self._berjalan = False
+            self._kondisi.notify_all()
+
+    def baca(self, tunggu=2.0):
+        """Frame baru berikutnya dari kamera, seperti ``VideoCapture.read``"""
+        if not self.latar:
+            try:
+                return self._buka().baca()
+            except OSError as e:
+                print(f"Error: {e}")
+                return False, None
+        with self._kondisi:
+            # Membuka kamera bisa lebih lama dari batas per frame
+            if not self._kondisi.wait_for(lambda: self._siap or not self._berjalan, timeout=self.WAKTU_BUKA):
+                print("Error: Kamera belum siap")
+                return False, None
+            if not self._kondisi.wait_for(lambda: self._nomor > self._nomor_dibaca or self._error is not None,
+                                          timeout=tunggu):
+                return False, None
+            if self._nomor <= self._nomor_dibaca:
+                print(f"Error: {self._error}")
+                return False, None
+            self._nomor_dibaca = self._nomor
+            return True, self._frame
+
+    def scan(self, timeout=None, tampilkan=None):
+        """Id QR pertama yang terbaca dalam ``timeout`` detik (None = sampai dibatalkan), atau None"""
+        self._aktif = True
+        try:
+            if self.latar:
+                # Dibuka saat pertama dipakai, atau ulang bila kamera sempat dilepas/gagal
+                self._mulai_latar()
+                with self._kondisi:
+                    self._nomor_dibaca = self._nomor
+            if not self.scanner.headless and tampilkan is not False:
+                print("Tekan 'q' untuk keluar dari mode scan\n")
+            return self.scanner.scan(self, tampilkan=tampilkan, timeout=timeout)
+        finally:
+            self._terakhir_dipakai = time.monotonic()
+            self._aktif = False
+
+    def _tutup_kamera(self):
+        if self._kamera is not None:
+            self._kamera.tutup()
+            self._kamera = None
+
+    def tutup(self):
+        """Menghentikan thread latar dan melepas kamera; aman dipanggil lebih dari sekali"""
+        self._berhenti = True
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        self._tutup_kamera()
+
+
+def buka_sumber(sumber):
+    """Angka -> kamera, folder/gambar -> SumberFolder, file lain -> SumberVideo"""
+    if isinstance(sumber, int) or str(sumber).isdigit():
+        return SumberKamera(int(sumber))
+    path = Path(sumber)
+    if path.is_dir() or path.suffix.lower() in EKSTENSI_GAMBAR:
+        return SumberFolder(path)
+    return SumberVideo(path)
+
 
 class QRScanner:
-    def scan_from_camera(self):
-        print("\nMembuka kamera untuk scan QR code...")
-        print("Tekan 'q' untuk keluar dari mode scan\n")
-        
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("Error: Tidak dapat membuka kamera!")
-            return None
-        
-        qr_data = None
-        
+    # Hanya setiap frame ke-N kamera yang dikirim ke pekerja dekode
+    LEWATI_FRAME = 2
+
+    def __init__(self, headless=False):
+        # Tanpa jendela preview, mis. di kiosk tanpa layar atau saat pengujian
+        self.headless = headless
+
+    def pindai(self, sumber=0, tampilkan=None, unik=True, timeout=None):
+        """Generator yang menghasilkan setiap id QR terbaca dari kamera, video, gambar atau folder
+
+        Dengan ``unik`` setiap isi QR hanya dihasilkan sekali per pemindaian. Sumber yang
+        diberikan sebagai objek (mis. SesiKamera) tidak ditutup di akhir pemindaian.
+        """
+        if tampilkan is None:
+            tampilkan = not self.headless
+        milik_sendiri = not hasattr(sumber, 'baca')
+        if milik_sendiri:
+            sumber = buka_sumber(sumber)
+        batas_waktu = time.monotonic() + timeout if timeout is not None else None
+        pekerja = None
+        if sumber.langsung:
+            pekerja = PekerjaDekode()
+            pekerja.start()
+        sudah = set()
+        roi = None
+        nomor_frame = 0
+
         try:
-            while True:
-                ret, frame = cap.read()
+            while batas_waktu is None or time.monotonic() < batas_waktu:
+                ret, frame = sumber.baca()
                 if not ret:
-                    print("Error: Tidak dapat membaca frame dari kamera!")
-                    break
-                
-                decoded_objects = decode(frame)
-                for obj in decoded_objects:
-                    qr_data = obj.data.decode('utf-8')
-                    print(f"QR Code terdeteksi: {qr_data}")
-                    points = obj.polygon
-                    if len(points) > 4:
-                        hull = cv2.convexHull(np.array([point for point in points], dtype=np.float32))
-                        cv2.polylines(frame, [hull], True, (0, 255, 0), 3)
-                    else:
-                        for j in range(4):
-                            cv2.line(frame, points[j], points[(j+1) % 4], (0, 255, 0), 3)
-                cv2.putText(frame, "Arahkan QR Code ke kamera", (10, 30), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                cv2.putText(frame, "Tekan 'q' untuk keluar", (10, 70), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                cv2.imshow("QR Code Scanner", frame)
-                if qr_data or cv2.waitKey(1) & 0xFF == ord('q'):
+                    if milik_sendiri and sumber.langsung:
+                        print("Error: Tidak dapat membaca frame dari kamera!")
                     break
-        
+
+                nomor_frame += 1
+                if pekerja is not None:
+                    if nomor_frame % self.LEWATI_FRAME == 0:
+                        pekerja.kirim(frame)
+                    hasil = pekerja.ambil()
+                else:
+                    hasil = dekode_frame(frame, roi=roi)
+                    roi = roi_dari(hasil[0][1], frame.shape) if hasil and hasil[0][1] else None
+
+                baru = []
+                for data, points in hasil:
+                    if tampilkan:
+                        if len(points) > 4:
+                            hull = cv2.convexHull(np.array(points, dtype=np.int32))
+                            cv2.polylines(frame, [hull], True, (0, 255, 0), 3)
+                        elif len(points) == 4:
+                            for j in range(4):
+                                cv2.line(frame, points[j], points[(j+1) % 4], (0, 255, 0), 3)
+                    if unik and data in sudah:
+                        continue
+                    sudah.add(data)
+                    baru.append(data)
+
+                if tampilkan:
+                    cv2.putText(frame, "Arahkan QR Code ke kamera", (10, 30), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                    cv2.putText(frame, "Tekan 'q' untuk keluar", (10, 70), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                    cv2.imshow("QR Code Scanner", frame)
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+                for data in baru:
+                    yield data
         finally:
-            cap.release()
-            cv2.destroyAllWindows()
-            
-        return qr_data
\ No newline at end of file
+            if pekerja is not None:
+                pekerja.berhenti()
+            if milik_sendiri:
+                sumber.tutup()
+            if tampilkan:
+                cv2.destroyAllWindows()
+
+    def scan(self, sumber=0, tampilkan=None, timeout=None):
+        """Id QR pertama yang terbaca dari sumber, atau None"""
+        try:
+            with closing(self.pindai(sumber, tampilkan, timeout=timeout)) as hasil:
+                for qr_data in hasil:
+                    return qr_data
+        except OSError as e:
+            print(f"Error: {e}")
+        return None
+
+    def scan_from_camera(self):
+        print("\nMembuka kamera untuk scan QR code...")
+        if not self.headless:
+            print("Tekan 'q' untuk keluar dari mode scan\n")
+        qr_data = self.scan(0)
+        if qr_data:
+            print(f"QR Code terdeteksi: {qr_data}")
+        return qr_data
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--scan":
+        # python qr_handler.py --scan <gambar|folder|video|nomor_kamera> -> cetak semua id (tanpa jendela)
+        for qr_data in QRScanner(headless=True).pindai(sys.argv[2]):
+            print(qr_data)
+        sys.exit(0)
+    # python qr_handler.py [folder_data] -> buat ulang semua QR di paket
+    # (PNG lama dipindah ke paket oleh main.py, yang juga membereskan path lamanya)
+    base_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("data")
+    generator = QRGenerator(base_dir / "qr_codes.db")
+    try:
+        hasil = generator.regenerate_semua()
+        print(f"✓ {len(hasil['dibuat'])} QR Code dibuat ulang, {len(hasil['gagal'])} gagal")
+    finally:
+        generator.tutup()
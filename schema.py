@@ -0,0 +1,141 @@
+import pandas as pd
+
+STATUS = ('menunggu', 'terpanggil', 'diperiksa', 'siap_ambil_obat', 'obat_tidak_tersedia', 'selesai')
+POLI = ('Poli Umum', 'Poli Gigi', 'Poli Lansia')
+JENIS_KELAMIN = ('Laki-laki', 'Perempuan')
+# Kelas prioritas antrean: angka kecil dipanggil lebih dulu
+PRIORITAS_TINGGI = 0
+PRIORITAS_BIASA = 1
+USIA_PRIORITAS = 60
+
+# Tipe setiap kolom: 'teks', 'angka' (Int64 nullable), 'tanggal'/'waktu' (datetime64),
+# atau tuple nilai untuk kolom kategori. Urutan kolom = urutan kolom di file Excel.
+SKEMA = {
+    'antrean': {
+        'id': 'teks',
+        'nomor_antrean': 'angka',
+        'nama': 'teks',
+        'nik': 'teks',
+        'tanggal': 'tanggal',
+        'status': STATUS,
+        'waktu_daftar': 'waktu',
+        'waktu_panggil': 'waktu',
+        'poli': POLI,
+        'kode_antrean': 'teks',
+        'prioritas': 'angka'
+    },
+    'master': {
+        'id_pasien': 'teks',
+        'nik': 'teks',
+        'nama': 'teks',
+        'jenis_kelamin': JENIS_KELAMIN,
+        'tempat_lahir': 'teks',
+        'tanggal_lahir': 'teks',
+        'alamat': 'teks',
+        'riwayat_penyakit': 'teks',
+        'tanggal_daftar_pertama': 'waktu',
+        'qr_code_path': 'teks'
+    },
+    'pemeriksaan': {
+        'id_pemeriksaan': 'teks',
+        'id_pasien': 'teks',
+        'nama_pasien': 'teks',
+        'tanggal_pemeriksaan': 'tanggal',
+        'keluhan': 'teks',
+        'tekanan_darah': 'teks',
+        'nadi': 'teks',
+        'suhu': 'teks',
+        'diagnosis': 'teks',
+        'tindakan': 'teks',
+        'resep': 'teks',
+        'catatan': 'teks',
+        'waktu_periksa': 'waktu'
+    }
+}
+
+FORMAT_TEKS = {'tanggal': "%Y-%m-%d", 'waktu': "%Y-%m-%d %H:%M:%S"}
+
+
+def _kategori(seri, nilai_dasar):
+    # Nilai di luar daftar (data lama/diedit manual) tetap dipertahankan sebagai kategori tambahan
+    seri = seri.astype(object).where(seri.notna(), None)
+    lain = sorted(set(str(v) for v in seri.dropna()) - set(nilai_dasar))
+    return pd.Series(pd.Categorical(seri, categories=list(nilai_dasar) + lain), index=seri.index)
+
+
+def _konversi_seri(seri, tipe):
+    if tipe == 'angka':
+        return pd.to_numeric(seri, errors='coerce').round().astype('Int64')
+    if tipe in FORMAT_TEKS:
+        seri = seri.where(seri.astype(str).str.strip() != '', None)
+        return pd.to_datetime(seri, errors='coerce', format='mixed')
+    if isinstance(tipe, tuple):
+        return _kategori(seri, tipe)
+    return seri
+
+
+def terapkan(tabel, df):
+    """DataFrame baru dengan dtype setiap kolom sesuai SKEMA tabel"""
+    skema = SKEMA[tabel]
+    kolom_baru = {}
+    for kolom, tipe in skema.items():
+        if kolom in df.columns:
+            seri = df[kolom]
+        else:
+            seri = pd.Series([None] * len(df), index=df.index, dtype=object)
+        kolom_baru[kolom] = _konversi_seri(seri, tipe)
+    for kolom in df.columns:
+        if kolom not in skema:
+            kolom_baru[kolom] = df[kolom]
+    return pd.DataFrame(kolom_baru, index=df.index)
+
+
+def rapikan_kategori(tabel, df):
+    """Mengembalikan dtype kategori yang hilang setelah pd.concat kategori yang berbeda"""
+    for kolom, tipe in SKEMA[tabel].items():
+        if isinstance(tipe, tuple) and kolom in df.columns and not isinstance(df[kolom].dtype, pd.CategoricalDtype):
+            df[kolom] = _kategori(df[kolom], tipe)
+    return df
+
+
+def siapkan_kategori(df, kolom, nilai):
+    """Menambah kategori baru agar nilai bisa di-assign ke kolom kategori"""
+    if kolom in df.columns and isinstance(df[kolom].dtype, pd.CategoricalDtype):
+        if nilai is not None and not pd.isna(nilai) and nilai not in df[kolom].cat.categories:
+            df[kolom] = df[kolom].cat.add_categories([nilai])
+
+
+def konversi_nilai(tabel, kolom, nilai):
+    tipe = SKEMA[tabel].get(kolom)
+    if tipe in FORMAT_TEKS:
+        if nilai is None or (isinstance(nilai, str) and not nilai.strip()):
+            return pd.NaT
+        return pd.to_datetime(nilai, errors='coerce')
+    if tipe == 'angka':
+        if nilai is None or pd.isna(nilai):
+            return pd.NA
+        return int(nilai)
+    return nilai
+
+
+def konversi_baris(tabel, data):
+    return {kolom: konversi_nilai(tabel, kolom, nilai) for kolom, nilai in data.items()}
+
+
+def ke_teks(tabel, kolom, nilai):
+    """Nilai tanggal/waktu sebagai teks dengan format yang dipakai aplikasi"""
+    tipe = SKEMA[tabel].get(kolom)
+    if tipe in FORMAT_TEKS and nilai is not None and not isinstance(nilai, str):
+        if pd.isna(nilai):
+            return None
+        return nilai.strftime(FORMAT_TEKS[tipe])
+    return nilai
+
+
+def ke_frame_teks(tabel, df):
+    """Salinan DataFrame dengan kolom tanggal/waktu sebagai teks, untuk ditulis ke Excel"""
+    df = df.copy()
+    for kolom, tipe in SKEMA[tabel].items():
+        if tipe in FORMAT_TEKS and kolom in df.columns:
+            df[kolom] = df[kolom].map(lambda nilai: ke_teks(tabel, kolom, nilai))
+    return df
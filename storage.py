@@ -0,0 +1,932 @@
+import pandas as pd
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import datetime
+from contextlib import contextmanager
+import schema
+from indeks import IndeksHash, IndeksUrut
+from journal import Journal
+from kunci import KunciFile
+
+# Kolom setiap tabel, urutannya sama dengan kolom di file Excel
+KOLOM = {tabel: list(kolom) for tabel, kolom in schema.SKEMA.items()}
+
+# Kolom yang mengidentifikasi satu baris, dipakai agar replay journal idempoten
+KUNCI = {
+    'antrean': ['id', 'tanggal'],
+    'master': ['id_pasien'],
+    'pemeriksaan': ['id_pemeriksaan']
+}
+
+
+def _sha1_file(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for blok in iter(lambda: f.read(1 << 20), b''):
+            h.update(blok)
+    return h.hexdigest()
+
+
+def _normalisasi_nik(nik):
+    return str(nik).strip() if pd.notna(nik) else None
+
+
+def _normalisasi_tanggal(tanggal):
+    if tanggal is None or pd.isna(tanggal):
+        return None
+    if hasattr(tanggal, 'strftime'):
+        return tanggal.strftime("%Y-%m-%d")
+    return str(tanggal)[:10]
+
+
+def _normalisasi_waktu(waktu):
+    # Teks 'YYYY-MM-DD HH:MM:SS' bisa dibandingkan langsung; kosong diurutkan paling awal
+    if waktu is None or (not isinstance(waktu, str) and pd.isna(waktu)):
+        return ''
+    if isinstance(waktu, datetime.datetime):
+        return waktu.strftime("%Y-%m-%d %H:%M:%S")
+    if hasattr(waktu, 'strftime'):
+        return waktu.strftime("%Y-%m-%d")
+    return str(waktu).strip()[:19]
+
+
+def _batas_waktu(waktu, akhir=False):
+    """Batas rentang waktu; tanggal saja sebagai batas akhir mencakup seluruh hari itu"""
+    if waktu is None:
+        return None
+    waktu = _normalisasi_waktu(waktu)
+    if akhir and len(waktu) == 10:
+        waktu += " 23:59:59"
+    return waktu
+
+
+NORMALISASI = {'nik': _normalisasi_nik, 'tanggal': _normalisasi_tanggal, 'waktu_periksa': _normalisasi_waktu}
+
+# Index hash yang dijaga ExcelStorage per tabel (kolom terbanyak dicoba lebih dulu).
+# Index ('tanggal',) berfungsi sebagai partisi harian: baris hari ini tanpa scan histori.
+INDEKS = {
+    'antrean': [('tanggal', 'id'), ('tanggal',)],
+    'master': [('id_pasien',), ('nik',)],
+    'pemeriksaan': []
+}
+
+# Index (kolom kunci, kolom urut) untuk query "terbaru" dan rentang waktu per pasien
+INDEKS_URUT = {
+    'antrean': [],
+    'master': [],
+    'pemeriksaan': [(('id_pasien',), 'waktu_periksa')]
+}
+
+# Tabel besar yang hanya dibutuhkan menu dokter/farmasi, tidak dimuat saat startup
+MUAT_SAAT_DIPAKAI = {'pemeriksaan'}
+
+
+class ExcelStorage:
+    """Penyimpanan default: DataFrame di memori, journal mutasi, dan snapshot Excel.
+
+    Mutasi langsung ditulis ke journal; thread latar belakang menggabungkan fsync
+    beberapa mutasi dalam satu jendela ``jeda_flush`` (group commit) dan menulis ulang
+    snapshot Excel hanya untuk tabel yang berubah. Dengan ``durable=True`` setiap mutasi
+    di-fsync sebelum method kembali.
+    """
+
+    def __init__(self, excel_path, master_pasien_path, batas_kompaksi=200, jeda_flush=0.5, durable=False,
+                 batas_buffer=500):
+        self.paths = {
+            'antrean': excel_path,
+            'master': master_pasien_path,
+            'pemeriksaan': excel_path.parent / "data_pemeriksaan.xlsx"
+        }
+        self.arsip_dir = excel_path.parent / "arsip_antrean"
+        self.batas_kompaksi = batas_kompaksi
+        self.jeda_flush = jeda_flush
+        self.durable = durable
+        self.batas_buffer = batas_buffer
+        self._lock = threading.RLock()
+        self._lock_kompaksi = threading.Lock()
+        # Beberapa terminal (pendaftaran, dokter, farmasi) boleh memakai folder data yang sama
+        self._kunci = KunciFile(excel_path.parent / ".data.lock")
+        self._kunci_kompaksi = KunciFile(excel_path.parent / ".kompaksi.lock")
+        self.journal = Journal(excel_path.parent / "journal.jsonl")
+        with self._lock, self._kunci:
+            self._muat_ulang()
+
+        self._ada_perubahan = threading.Event()
+        self._berhenti = threading.Event()
+        self._flusher = threading.Thread(target=self._jalankan_flusher, daemon=True)
+        self._flusher.start()
+
+    def _muat_ulang(self):
+        """Memuat tabel dari snapshot lalu menerapkan journal (kunci data sudah dipegang)"""
+        self._df = {}
+        self._indeks = {}
+        self._label_berikutnya = {}
+        # Baris baru (label -> dict) yang belum digabung ke DataFrame, lihat _materialisasi()
+        self._buffer = {}
+        # Record journal untuk tabel yang belum dimuat, diterapkan saat tabel dimuat
+        self._tertunda = {}
+        # Nomor antrean terbesar per (tanggal, poli), dibangun ulang dari data saat dimuat
+        self._nomor_maks = {}
+        self._dirty = set()
+        self._generasi = self.journal.generasi()
+        for tabel in KOLOM:
+            if tabel not in MUAT_SAAT_DIPAKAI:
+                self._pastikan_dimuat(tabel)
+        self.replay_journal()
+
+    def _sinkronkan(self):
+        """Menerapkan mutasi yang ditulis proses lain (kunci data sudah dipegang)"""
+        if self.journal.generasi() != self._generasi:
+            # Proses lain sudah mengompaksi journal: mulai lagi dari snapshot terbaru
+            self._muat_ulang()
+            return True
+        records = self.journal.baca_baru()
+        for record in records:
+            try:
+                self._terapkan(record, replay=True)
+            except Exception as e:
+                print(f"Error saat sinkronisasi journal: {e}")
+        return bool(records)
+
+    def sinkronkan(self):
+        """Mengambil perubahan dari terminal lain; True bila ada yang berubah"""
+        with self._lock, self._kunci:
+            return self._sinkronkan()
+
+    @contextmanager
+    def transaksi(self):
+        """Mengunci data untuk terminal lain, setelah lebih dulu menyinkronkan perubahan mereka"""
+        with self._lock, self._kunci:
+            if self._kunci.tingkat == 1:
+                self._sinkronkan()
+            yield
+
+    def _pastikan_dimuat(self, tabel):
+        """Memuat tabel dari snapshot saat pertama kali dipakai"""
+        if tabel in self._df:
+            return self._df[tabel]
+        self._df[tabel] = self._muat(tabel).reset_index(drop=True)
+        self._buffer[tabel] = {}
+        self._label_berikutnya[tabel] = len(self._df[tabel])
+        self._indeks[tabel] = [IndeksHash(kolom, NORMALISASI)
+                               for kolom in INDEKS[tabel]]
+        self._indeks[tabel] += [IndeksUrut(kolom, kolom_urut, NORMALISASI)
+                                for kolom, kolom_urut in INDEKS_URUT[tabel]]
+        for indeks in self._indeks[tabel]:
+            indeks.bangun(self._df[tabel])
+        if tabel == 'antrean':
+            df = self._df[tabel]
+            for baris in zip(df['tanggal'], df['poli'], df['nomor_antrean']):
+                self._catat_nomor(*baris)
+        for record in self._tertunda.pop(tabel, []):
+            try:
+                self._terapkan(record, replay=True)
+            except Exception as e:
+                print(f"Error saat replay journal: {e}")
+        return self._df[tabel]
+
+    def _muat(self, tabel):
+        path = self.paths[tabel]
+        if path.exists():
+            df = self._baca_cache(tabel)
+            if df is not None:
+                return schema.terapkan(tabel, df)
+            dtype = {'nik': str} if 'nik' in KOLOM[tabel] else None
+            df = schema.terapkan(tabel, pd.read_excel(str(path), dtype=dtype))
+            self._tulis_cache(tabel, df)
+            return df
+        return schema.terapkan(tabel, pd.DataFrame(columns=KOLOM[tabel]))
+
+    def _tulis_excel(self, tabel, df):
+        # Tulis ke file sementara lalu ganti, agar snapshot tidak pernah setengah jadi
+        path = self.paths[tabel]
+        tmp_path = path.with_name(f".{path.stem}.tmp{path.suffix}")
+        schema.ke_frame_teks(tabel, df).to_excel(str(tmp_path), index=False)
+        os.replace(tmp_path, path)
+        self._tulis_cache(tabel, df)
+
+    # === CACHE SNAPSHOT ===
+
+    def _cache_path(self, tabel):
+        path = self.paths[tabel]
+        return path.with_name(f".{path.stem}.cache.pkl")
+
+    def _tulis_cache(self, tabel, df):
+        """Menyimpan salinan biner snapshot beserta sidik file Excel sumbernya"""
+        path = self.paths[tabel]
+        cache_path = self._cache_path(tabel)
+        # Nama sementara unik per proses/thread: beberapa terminal bisa menulis cache bersamaan
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            stat = path.stat()
+            data = {
+                'ukuran': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'sha1': _sha1_file(path),
+                'df': df
+            }
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"Warning: Gagal menyimpan cache {cache_path.name}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _baca_cache(self, tabel):
+        """DataFrame dari cache bila file Excel belum diubah di luar aplikasi, selain itu None"""
+        path = self.paths[tabel]
+        cache_path = self._cache_path(tabel)
+        if not cache_path.exists():
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                data = pickle.load(f)
+            stat = path.stat()
+            if data['ukuran'] != stat.st_size:
+                return None
+            # mtime bisa berubah tanpa isi berubah (disalin/restore backup), cek isinya
+            if data['mtime_ns'] != stat.st_mtime_ns and data['sha1'] != _sha1_file(path):
+                return None
+            return data['df']
+        except Exception:
+            return None
+
+    def _cari_index(self, tabel, df, kriteria):
+        mask = pd.Series(True, index=df.index)
+        for kolom, nilai in kriteria.items():
+            if kolom == 'nik':
+                mask &= df[kolom].str.strip() == str(nilai).strip()
+            else:
+                mask &= df[kolom] == schema.konversi_nilai(tabel, kolom, nilai)
+        return df[mask].index
+
+    def _label(self, tabel, kriteria):
+        """Label baris yang cocok dengan kriteria, lewat index hash bila tersedia"""
+        self._pastikan_dimuat(tabel)
+        for indeks in self._indeks[tabel]:
+            if set(indeks.kolom) <= set(kriteria):
+                labels = indeks.cari(kriteria)
+                sisa = {k: v for k, v in kriteria.items() if k not in indeks.kolom}
+                if sisa and labels:
+                    return self._cari_index(tabel, self._ambil(tabel, labels), sisa)
+                return pd.Index(labels)
+        self._materialisasi(tabel)
+        return self._cari_index(tabel, self._df[tabel], kriteria)
+
+    def _ambil(self, tabel, labels):
+        """Baris untuk label tertentu, baik yang sudah di DataFrame maupun masih di buffer"""
+        df = self._df[tabel]
+        buffer = self._buffer[tabel]
+        baru = [label for label in labels if label in buffer]
+        if not baru:
+            return df.loc[labels]
+        # Label buffer selalu lebih besar dari label DataFrame, urutan tetap terjaga
+        lama = [label for label in labels if label not in buffer]
+        baris_baru = pd.DataFrame([buffer[label] for label in baru], index=baru, columns=df.columns)
+        return schema.terapkan(tabel, pd.concat([df.loc[lama], baris_baru]))
+
+    def _materialisasi(self, tabel):
+        """Menggabungkan buffer baris baru ke DataFrame dalam satu kali concat"""
+        buffer = self._buffer[tabel]
+        if buffer:
+            baru = schema.terapkan(tabel, pd.DataFrame(list(buffer.values()), index=list(buffer)))
+            self._df[tabel] = schema.rapikan_kategori(tabel, pd.concat([self._df[tabel], baru]))
+            buffer.clear()
+
+    # === QUERY ===
+
+    def semua(self, tabel):
+        with self.transaksi():
+            self._pastikan_dimuat(tabel)
+            self._materialisasi(tabel)
+            return self._df[tabel]
+
+    def cari(self, tabel, **kriteria):
+        with self.transaksi():
+            labels = self._label(tabel, kriteria)
+            return self._ambil(tabel, labels)
+
+    def cari_rentang(self, tabel, kolom_urut, kriteria, dari=None, sampai=None, lewati=0, batas=None,
+                     terbaru_dulu=False):
+        """Baris yang cocok dengan kriteria, urut menurut kolom_urut, dibatasi rentang dan halaman"""
+        with self.transaksi():
+            self._pastikan_dimuat(tabel)
+            indeks = next((i for i in self._indeks[tabel] if isinstance(i, IndeksUrut)
+                           and i.kolom_urut == kolom_urut and set(i.kolom) == set(kriteria)), None)
+            dari, sampai = _batas_waktu(dari), _batas_waktu(sampai, akhir=True)
+            if indeks is not None:
+                labels = indeks.rentang(kriteria, dari, sampai, lewati, batas, terbaru_dulu)
+                return self._ambil(tabel, labels).loc[labels]
+
+            # Tanpa index urut: saring dan urutkan seluruh hasil pencarian
+            hasil = self._ambil(tabel, self._label(tabel, kriteria))
+            nilai = hasil[kolom_urut].map(_normalisasi_waktu)
+            if dari is not None:
+                hasil, nilai = hasil[nilai >= dari], nilai[nilai >= dari]
+            if sampai is not None:
+                hasil, nilai = hasil[nilai <= sampai], nilai[nilai <= sampai]
+            hasil = hasil.loc[nilai.sort_values(kind='stable', ascending=not terbaru_dulu).index]
+            akhir = None if batas is None else lewati + batas
+            return hasil.iloc[lewati:akhir]
+
+    # === MUTASI ===
+
+    def tambah(self, tabel, data):
+        with self.transaksi():
+            self._catat({'tabel': tabel, 'aksi': 'tambah', 'data': data})
+
+    def ubah(self, tabel, kriteria, data, semua=True):
+        with self.transaksi():
+            jumlah = len(self._label(tabel, kriteria))
+            if jumlah and data:
+                self._catat({'tabel': tabel, 'aksi': 'ubah', 'data': data,
+                             'kriteria': kriteria, 'semua': semua})
+            return jumlah if semua else min(jumlah, 1)
+
+    def hapus(self, tabel, kriteria):
+        with self.transaksi():
+            jumlah = len(self._label(tabel, kriteria))
+            if jumlah:
+                self._catat({'tabel': tabel, 'aksi': 'hapus', 'kriteria': kriteria})
+            return jumlah
+
+    def tambah_banyak(self, tabel, df):
+        """Menambah banyak baris sekaligus sebagai satu record journal dan satu concat"""
+        df = df[[k for k in KOLOM[tabel] if k in df.columns]]
+        df = df.astype(object).where(df.notna(), None)
+        data = df.to_dict('records')
+        with self.transaksi():
+            if data:
+                self._catat({'tabel': tabel, 'aksi': 'tambah_banyak', 'data': data})
+        return len(data)
+
+    def sudah_ada(self, tabel, kolom, daftar_nilai):
+        """Nilai dari daftar_nilai yang sudah ada di kolom tabel, lewat index bila tersedia"""
+        with self.transaksi():
+            self._pastikan_dimuat(tabel)
+            indeks = next((i for i in self._indeks[tabel] if i.kolom == (kolom,)), None)
+            if indeks is not None:
+                return {nilai for nilai in daftar_nilai if indeks.cari({kolom: nilai})}
+            self._materialisasi(tabel)
+            ada = set(self._df[tabel][kolom].dropna())
+            return {nilai for nilai in daftar_nilai if nilai in ada}
+
+    def hapus_sekaligus(self, operasi):
+        """Menghapus pasangan (tabel, kriteria) sebagai satu record journal: semua atau tidak sama sekali"""
+        with self.transaksi():
+            jumlah = [len(self._label(tabel, kriteria)) for tabel, kriteria in operasi]
+            records = [{'tabel': tabel, 'aksi': 'hapus', 'kriteria': kriteria}
+                       for (tabel, kriteria), n in zip(operasi, jumlah) if n]
+            # Riwayat antrean yang sudah diarsipkan ikut dihapus; arsip lama disimpan
+            # sebagai cadangan sampai record batch tercatat
+            cadangan = []
+            try:
+                for i, (tabel, kriteria) in enumerate(operasi):
+                    if tabel == 'antrean':
+                        jumlah[i] += self._hapus_dari_arsip(kriteria, cadangan)
+                if records:
+                    record = {'aksi': 'batch', 'records': records}
+                    salinan = self._salin_keadaan([(r['tabel'], r['kriteria']) for r in records])
+                    try:
+                        self._terapkan(record)
+                        self.journal.catat(record, sinkron=self.durable)
+                    except Exception:
+                        self._pulihkan_keadaan(salinan)
+                        raise
+                    self._ada_perubahan.set()
+            except Exception:
+                for path, simpan in reversed(cadangan):
+                    os.replace(simpan, path)
+                raise
+            for _, simpan in cadangan:
+                try:
+                    os.remove(simpan)
+                except OSError:
+                    pass
+            return jumlah
+
+    def _hapus_dari_arsip(self, kriteria, cadangan):
+        """Menulis ulang arsip bulanan tanpa baris yang cocok dengan kriteria
+
+        File arsip lama dipindah ke cadangan (path, path cadangan) yang ditambahkan ke
+        ``cadangan``; mengembalikan jumlah baris arsip yang terhapus.
+        """
+        jumlah = 0
+        for path in sorted(self.arsip_dir.glob("antrean_*.csv.gz")):
+            # Dibaca sebagai teks apa adanya agar baris lain ditulis ulang tanpa berubah
+            arsip = pd.read_csv(path, dtype=str, keep_default_na=False, compression='gzip')
+            if not set(kriteria) <= set(arsip.columns):
+                continue
+            mask = pd.Series(True, index=arsip.index)
+            for kolom, nilai in kriteria.items():
+                mask &= arsip[kolom].str.strip() == str(nilai).strip()
+            if not mask.any():
+                continue
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            if not mask.all():
+                arsip[~mask].to_csv(tmp_path, index=False, compression='gzip')
+            simpan = path.with_name(f".{path.name}.hapus")
+            os.replace(path, simpan)
+            cadangan.append((path, simpan))
+            if not mask.all():
+                os.replace(tmp_path, path)
+            jumlah += int(mask.sum())
+        return jumlah
+
+    def _salin_keadaan(self, operasi):
+        """Salinan untuk rollback penghapusan: hanya baris yang terhapus dan kunci index-nya"""
+        label_per_tabel = {}
+        for tabel, kriteria in operasi:
+            label_per_tabel.setdefault(tabel, []).extend(self._label(tabel, kriteria))
+        salinan = {'dirty': set(self._dirty), 'tabel': {}}
+        for tabel, labels in label_per_tabel.items():
+            df = self._df[tabel]
+            buffer = self._buffer[tabel]
+            baris = [buffer[label] if label in buffer else df.loc[label] for label in labels]
+            # DataFrame tidak diubah di tempat (drop membuat yang baru), cukup referensinya
+            salinan['tabel'][tabel] = (
+                df,
+                {label: buffer[label] for label in labels if label in buffer},
+                [indeks.salin_kunci(baris) for indeks in self._indeks[tabel]]
+            )
+        return salinan
+
+    def _pulihkan_keadaan(self, salinan):
+        self._dirty = salinan['dirty']
+        for tabel, (df, baris_buffer, kunci_indeks) in salinan['tabel'].items():
+            self._df[tabel] = df
+            if baris_buffer:
+                # Urutan label buffer menentukan urutan baris setelah materialisasi
+                self._buffer[tabel] = dict(sorted({**self._buffer[tabel], **baris_buffer}.items()))
+            for indeks, kunci in zip(self._indeks[tabel], kunci_indeks):
+                indeks.pulihkan_kunci(kunci)
+
+    # === JOURNAL ===
+
+    def _terapkan(self, record, replay=False):
+        """Menerapkan satu record journal ke DataFrame di memori"""
+        if record['aksi'] == 'batch':
+            for bagian in record['records']:
+                self._terapkan(bagian, replay)
+            return
+        tabel = record['tabel']
+        if replay and tabel not in self._df:
+            self._tertunda.setdefault(tabel, []).append(record)
+            return
+        self._pastikan_dimuat(tabel)
+        aksi = record['aksi']
+        indeks_tabel = self._indeks[tabel]
+
+        if aksi == 'tambah':
+            data = record['data']
+            if replay and len(self._label(tabel, {k: data[k] for k in KUNCI[tabel]})):
+                return
+            label = self._label_berikutnya[tabel]
+            self._label_berikutnya[tabel] += 1
+            buffer = self._buffer[tabel]
+            buffer[label] = schema.konversi_baris(tabel, data)
+            for indeks in indeks_tabel:
+                indeks.tambah(label, data)
+            if tabel == 'antrean':
+                self._catat_nomor(data.get('tanggal'), data.get('poli'), data.get('nomor_antrean'))
+            if len(buffer) >= self.batas_buffer:
+                self._materialisasi(tabel)
+        elif aksi == 'tambah_banyak':
+            data = record['data']
+            if replay:
+                data = [baris for baris in data
+                        if not len(self._label(tabel, {k: baris.get(k) for k in KUNCI[tabel]}))]
+            if not data:
+                return
+            # Langsung satu concat, tanpa lewat buffer
+            self._materialisasi(tabel)
+            awal = self._label_berikutnya[tabel]
+            labels = range(awal, awal + len(data))
+            self._label_berikutnya[tabel] += len(data)
+            baru = schema.terapkan(tabel, pd.DataFrame(data, index=labels))
+            self._df[tabel] = schema.rapikan_kategori(tabel, pd.concat([self._df[tabel], baru]))
+            for indeks in indeks_tabel:
+                for label, baris in zip(labels, data):
+                    indeks.tambah(label, baris)
+            if tabel == 'antrean':
+                for baris in data:
+                    self._catat_nomor(baris.get('tanggal'), baris.get('poli'), baris.get('nomor_antrean'))
+        elif aksi == 'ubah':
+            idx = self._label(tabel, record['kriteria'])
+            if not record.get('semua', True):
+                idx = idx[:1]
+            data = schema.konversi_baris(tabel, record['data'])
+            terdampak = [i for i in indeks_tabel if set(i.kolom_terkait) & set(data)]
+            buffer = self._buffer[tabel]
+            # Baris yang masih di buffer cukup diubah dict-nya, tanpa menyentuh DataFrame
+            for label in [label for label in idx if label in buffer]:
+                baris = buffer[label]
+                for indeks in terdampak:
+                    indeks.hapus(label, baris)
+                baris.update(data)
+                for indeks in terdampak:
+                    indeks.tambah(label, baris)
+            idx = pd.Index([label for label in idx if label not in buffer])
+            df = self._df[tabel]
+            for label in idx:
+                for indeks in terdampak:
+                    indeks.hapus(label, df.loc[label])
+            for field, value in data.items():
+                if len(idx):
+                    schema.siapkan_kategori(df, field, value)
+                    df.loc[idx, field] = value
+            for label in idx:
+                for indeks in terdampak:
+                    indeks.tambah(label, df.loc[label])
+        elif aksi == 'hapus':
+            self._df[tabel] = self._hapus_label(tabel, self._label(tabel, record['kriteria']))
+        elif aksi == 'arsip':
+            self._df[tabel] = self._hapus_label(tabel, self._label_sebelum(record['sebelum']))
+            for kunci in [k for k in self._nomor_maks if k[0] is None or k[0] < record['sebelum']]:
+                del self._nomor_maks[kunci]
+
+        self._dirty.add(tabel)
+
+    def _catat_nomor(self, tanggal, poli, nomor):
+        if nomor is None or pd.isna(nomor):
+            return
+        kunci = (_normalisasi_tanggal(tanggal), poli)
+        if int(nomor) > self._nomor_maks.get(kunci, 0):
+            self._nomor_maks[kunci] = int(nomor)
+
+    def alokasi_nomor(self, tanggal, poli):
+        """Nomor antrean berikutnya untuk poli pada tanggal tersebut
+
+        Nomor hanya unik bila dipanggil di dalam transaksi() yang sama dengan penyimpanan barisnya.
+        """
+        with self.transaksi():
+            kunci = (_normalisasi_tanggal(tanggal), poli)
+            nomor = self._nomor_maks.get(kunci, 0) + 1
+            # Langsung dipesan agar dua pendaftaran tidak mendapat nomor yang sama
+            self._nomor_maks[kunci] = nomor
+            return nomor
+
+    def _hapus_label(self, tabel, idx):
+        df = self._df[tabel]
+        buffer = self._buffer[tabel]
+        di_df = []
+        for label in idx:
+            baris = buffer.pop(label, None)
+            if baris is None:
+                baris = df.loc[label]
+                di_df.append(label)
+            for indeks in self._indeks[tabel]:
+                indeks.hapus(label, baris)
+        return df.drop(di_df)
+
+    def _catat(self, record):
+        """Mencatat mutasi ke journal lalu menerapkannya di memori"""
+        bobot = len(record['data']) if record['aksi'] == 'tambah_banyak' else 1
+        self.journal.catat(record, sinkron=self.durable, bobot=bobot)
+        self._terapkan(record)
+        self._ada_perubahan.set()
+
+    def replay_journal(self):
+        """Menerapkan ulang mutasi yang belum masuk snapshot Excel (setelah crash/tutup paksa)"""
+        for record in self.journal.baca():
+            try:
+                self._terapkan(record, replay=True)
+            except Exception as e:
+                print(f"Error saat replay journal: {e}")
+
+    def kompaksi(self):
+        """Menulis ulang snapshot Excel dari tabel yang berubah lalu membuang journal lama"""
+        with self._lock_kompaksi:
+            # Hanya satu terminal yang mengompaksi; yang lain cukup terus menulis journal
+            if not self._kunci_kompaksi.acquire(blocking=False):
+                return
+            try:
+                with self._lock, self._kunci:
+                    self._sinkronkan()
+                    # Tabel yang belum dimuat tapi punya record di journal harus ikut ditulis
+                    for tabel in list(self._tertunda):
+                        self._pastikan_dimuat(tabel)
+                    dirty = self._dirty
+                    self._dirty = set()
+                    for tabel in dirty:
+                        self._materialisasi(tabel)
+                    snapshot = {tabel: self._df[tabel].copy() for tabel in dirty}
+                    self._generasi = self.journal.rotasi()
+
+                # Penulisan Excel (lambat) berjalan tanpa memblokir mutasi berikutnya
+                try:
+                    for tabel in KOLOM:
+                        if tabel in snapshot:
+                            self._tulis_excel(tabel, snapshot[tabel])
+                except Exception:
+                    with self._lock:
+                        self._dirty |= dirty
+                    raise
+                with self._lock, self._kunci:
+                    self.journal.hapus_lama()
+            finally:
+                self._kunci_kompaksi.release()
+
+    def _jalankan_flusher(self):
+        while True:
+            self._ada_perubahan.wait()
+            # Tunggu sejenak agar beberapa mutasi tergabung dalam satu fsync/penulisan
+            if self._berhenti.wait(self.jeda_flush):
+                return
+            self._ada_perubahan.clear()
+            try:
+                with self._lock:
+                    self.journal.sinkronkan()
+                    perlu_kompaksi = self.journal.jumlah >= self.batas_kompaksi
+                if perlu_kompaksi:
+                    self.kompaksi()
+            except Exception as e:
+                print(f"Error saat menyimpan data: {e}")
+
+    def flush(self):
+        """Memastikan semua mutasi tersimpan: fsync journal dan tulis snapshot tabel yang berubah"""
+        with self._lock:
+            self.journal.sinkronkan()
+            perlu_kompaksi = bool(self._dirty)
+        if perlu_kompaksi:
+            self.kompaksi()
+
+    # === ARSIP ===
+
+    def _label_sebelum(self, sebelum_tanggal):
+        """Label baris antrean dengan tanggal < sebelum_tanggal, lewat partisi harian"""
+        indeks_hari = next(i for i in self._indeks['antrean'] if i.kolom == ('tanggal',))
+        labels = []
+        for (tanggal,) in indeks_hari.daftar_kunci():
+            if tanggal is not None and tanggal < sebelum_tanggal:
+                labels.extend(indeks_hari.cari({'tanggal': tanggal}))
+        return pd.Index(sorted(labels))
+
+    def arsipkan_antrean(self, sebelum_tanggal):
+        """Memindahkan antrean sebelum tanggal tertentu ke arsip bulanan (.csv.gz)"""
+        with self.transaksi():
+            labels = self._label_sebelum(sebelum_tanggal)
+            if labels.empty:
+                return 0
+
+            lama = self._ambil('antrean', labels)
+            self.arsip_dir.mkdir(exist_ok=True)
+            bulan = lama['tanggal'].map(lambda t: _normalisasi_tanggal(t)[:7])
+            for nama_bulan, rows in lama.groupby(bulan):
+                path = self.arsip_dir / f"antrean_{nama_bulan}.csv.gz"
+                rows.to_csv(path, mode='a', header=not path.exists(), index=False, compression='gzip')
+
+            self._catat({'tabel': 'antrean', 'aksi': 'arsip', 'sebelum': sebelum_tanggal})
+        self.kompaksi()
+        return len(labels)
+
+    def cari_riwayat_antrean(self, **kriteria):
+        """Mencari antrean di arsip bulanan dan data hari berjalan"""
+        files = sorted(self.arsip_dir.glob("antrean_*.csv.gz"))
+        if kriteria.get('tanggal'):
+            nama = f"antrean_{str(kriteria['tanggal'])[:7]}.csv.gz"
+            files = [f for f in files if f.name == nama]
+
+        frames = [pd.read_csv(f, dtype={'id': str, 'nik': str}, compression='gzip') for f in files]
+        if not frames:
+            return self.cari('antrean', **kriteria).reset_index(drop=True)
+
+        # Arsip bisa berisi baris ganda bila aplikasi mati sebelum journal arsip tercatat
+        arsip = schema.terapkan('antrean', pd.concat(frames, ignore_index=True))
+        arsip = arsip.drop_duplicates(subset=KUNCI['antrean'], keep='last')
+        hasil = arsip.loc[self._cari_index('antrean', arsip, kriteria)]
+        return schema.rapikan_kategori('antrean', pd.concat([hasil, self.cari('antrean', **kriteria)], ignore_index=True))
+
+    def tutup(self):
+        self._berhenti.set()
+        self._ada_perubahan.set()
+        if self._flusher.is_alive() and threading.current_thread() is not self._flusher:
+            self._flusher.join(timeout=5)
+        self.flush()
+        self.journal.tutup()
+
+
+def _ke_sql(tabel, kolom, nilai):
+    # sqlite3 tidak mengenal tipe numpy/pandas; tanggal disimpan sebagai teks
+    nilai = schema.ke_teks(tabel, kolom, nilai)
+    if nilai is None or nilai is pd.NA:
+        return None
+    if hasattr(nilai, 'item'):
+        nilai = nilai.item()
+    if isinstance(nilai, float) and pd.isna(nilai):
+        return None
+    if isinstance(nilai, (int, float, str)):
+        return nilai
+    return str(nilai)
+
+
+class SQLiteStorage:
+    """Penyimpanan SQLite: setiap mutasi satu transaksi, pencarian memakai index"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # Terminal lain bisa sedang menulis: tunggu kuncinya, jangan langsung gagal
+        self.conn = sqlite3.connect(str(db_path), timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._tingkat = 0
+        self._buat_skema()
+        self._versi_data = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextmanager
+    def transaksi(self):
+        """Beberapa operasi dalam satu transaksi; terminal lain menunggu sampai selesai"""
+        if self._tingkat:
+            self._tingkat += 1
+            try:
+                yield
+            finally:
+                self._tingkat -= 1
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._tingkat = 1
+        try:
+            yield
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+        finally:
+            self._tingkat = 0
+
+    @contextmanager
+    def _tulis(self):
+        # Di dalam transaksi() commit dilakukan di akhir transaksi
+        if self._tingkat:
+            yield
+        else:
+            with self.conn:
+                yield
+
+    def sinkronkan(self):
+        """True bila terminal lain mengubah database sejak pemeriksaan terakhir"""
+        versi = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        berubah = versi != self._versi_data
+        self._versi_data = versi
+        return berubah
+
+    def _buat_skema(self):
+        with self.conn:
+            for tabel, kolom in KOLOM.items():
+                # Kolom 'angka' disimpan INTEGER agar urutan dan perbandingannya numerik
+                tipe = {k: "INTEGER" if schema.SKEMA[tabel][k] == 'angka' else "TEXT" for k in kolom}
+                definisi = ", ".join(f"{k} {tipe[k]}" for k in kolom)
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {tabel} ({definisi})")
+                # Database lama: tambahkan kolom yang belum ada
+                ada = {baris[1] for baris in self.conn.execute(f"PRAGMA table_info({tabel})")}
+                for k in kolom:
+                    if k not in ada:
+                        self.conn.execute(f"ALTER TABLE {tabel} ADD COLUMN {k} {tipe[k]}")
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_master_id ON master (id_pasien)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_master_nik ON master (nik)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_antrean_tanggal_id ON antrean (tanggal, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_antrean_id ON antrean (id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_antrean_tanggal_poli "
+                              "ON antrean (tanggal, poli, nomor_antrean)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pemeriksaan_pasien ON pemeriksaan (id_pasien)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_pemeriksaan_pasien_waktu "
+                              "ON pemeriksaan (id_pasien, waktu_periksa)")
+
+    def _normalisasi(self, tabel, data):
+        data = {k: _ke_sql(tabel, k, v) for k, v in data.items()}
+        if data.get('nik') is not None:
+            data['nik'] = str(data['nik']).strip()
+        return data
+
+    def _syarat(self, tabel, kriteria):
+        kriteria = self._normalisasi(tabel, kriteria)
+        return [f"{k} = ?" for k in kriteria], list(kriteria.values())
+
+    def _where(self, tabel, kriteria, syarat=None, params=None):
+        syarat_kriteria, params_kriteria = self._syarat(tabel, kriteria)
+        syarat = syarat_kriteria + (syarat or [])
+        params = params_kriteria + (params or [])
+        if not syarat:
+            return "", []
+        return " WHERE " + " AND ".join(syarat), params
+
+    # === QUERY ===
+
+    def semua(self, tabel):
+        sql = f"SELECT {', '.join(KOLOM[tabel])} FROM {tabel} ORDER BY rowid"
+        return schema.terapkan(tabel, pd.read_sql_query(sql, self.conn))
+
+    def cari(self, tabel, **kriteria):
+        where, params = self._where(tabel, kriteria)
+        sql = f"SELECT {', '.join(KOLOM[tabel])} FROM {tabel}{where} ORDER BY rowid"
+        return schema.terapkan(tabel, pd.read_sql_query(sql, self.conn, params=params))
+
+    def cari_rentang(self, tabel, kolom_urut, kriteria, dari=None, sampai=None, lewati=0, batas=None,
+                     terbaru_dulu=False):
+        syarat, params = [], []
+        if dari is not None:
+            syarat.append(f"{kolom_urut} >= ?")
+            params.append(_batas_waktu(dari))
+        if sampai is not None:
+            syarat.append(f"{kolom_urut} <= ?")
+            params.append(_batas_waktu(sampai, akhir=True))
+        where, params = self._where(tabel, kriteria, syarat, params)
+        arah = "DESC" if terbaru_dulu else "ASC"
+        sql = (f"SELECT {', '.join(KOLOM[tabel])} FROM {tabel}{where} "
+               f"ORDER BY {kolom_urut} {arah}, rowid {arah} LIMIT ? OFFSET ?")
+        params += [-1 if batas is None else batas, lewati]
+        return schema.terapkan(tabel, pd.read_sql_query(sql, self.conn, params=params))
+
+    # === MUTASI ===
+
+    def tambah(self, tabel, data):
+        data = self._normalisasi(tabel, data)
+        with self._tulis():
+            self.conn.execute(
+                f"INSERT INTO {tabel} ({', '.join(data)}) VALUES ({', '.join('?' * len(data))})",
+                list(data.values())
+            )
+
+    def tambah_banyak(self, tabel, df):
+        kolom = [k for k in KOLOM[tabel] if k in df.columns]
+        rows = [[_ke_sql(tabel, k, v) for k, v in zip(kolom, row)]
+                for row in df[kolom].itertuples(index=False)]
+        if 'nik' in kolom:
+            i = kolom.index('nik')
+            for row in rows:
+                if row[i] is not None:
+                    row[i] = str(row[i]).strip()
+        with self._tulis():
+            self.conn.executemany(
+                f"INSERT INTO {tabel} ({', '.join(kolom)}) VALUES ({', '.join('?' * len(kolom))})",
+                rows
+            )
+        return len(rows)
+
+    def sudah_ada(self, tabel, kolom, daftar_nilai):
+        """Nilai dari daftar_nilai yang sudah ada di kolom tabel"""
+        daftar_nilai = list(daftar_nilai)
+        ada = set()
+        # Batas jumlah parameter SQLite
+        for i in range(0, len(daftar_nilai), 500):
+            bagian = daftar_nilai[i:i + 500]
+            sql = f"SELECT DISTINCT {kolom} FROM {tabel} WHERE {kolom} IN ({', '.join('?' * len(bagian))})"
+            ada |= {baris[0] for baris in self.conn.execute(sql, bagian)}
+        return ada
+
+    def ubah(self, tabel, kriteria, data, semua=True):
+        if not data:
+            return len(self.cari(tabel, **kriteria))
+        data = self._normalisasi(tabel, data)
+        where, params = self._where(tabel, kriteria)
+        set_sql = ", ".join(f"{k} = ?" for k in data)
+        if not semua:
+            where = f" WHERE rowid = (SELECT rowid FROM {tabel}{where} ORDER BY rowid LIMIT 1)"
+        with self._tulis():
+            cur = self.conn.execute(f"UPDATE {tabel} SET {set_sql}{where}", list(data.values()) + params)
+        return cur.rowcount
+
+    def hapus(self, tabel, kriteria):
+        where, params = self._where(tabel, kriteria)
+        with self._tulis():
+            cur = self.conn.execute(f"DELETE FROM {tabel}{where}", params)
+        return cur.rowcount
+
+    def hapus_sekaligus(self, operasi):
+        """Menghapus pasangan (tabel, kriteria) dalam satu transaksi"""
+        with self.transaksi():
+            return [self.hapus(tabel, kriteria) for tabel, kriteria in operasi]
+
+    def arsipkan_antrean(self, sebelum_tanggal):
+        # Histori tetap di tabel yang sama; index (tanggal, id) sudah membatasi query ke hari berjalan
+        return 0
+
+    def cari_riwayat_antrean(self, **kriteria):
+        return self.cari('antrean', **kriteria)
+
+    def flush(self):
+        # Setiap mutasi sudah di-commit dalam transaksinya sendiri
+        pass
+
+    def alokasi_nomor(self, tanggal, poli):
+        """Nomor antrean berikutnya untuk poli pada tanggal tersebut (lewat idx_antrean_tanggal_poli)
+
+        Nomor hanya unik bila dipanggil di dalam transaksi() yang sama dengan penyimpanan barisnya.
+        """
+        tanggal = _ke_sql('antrean', 'tanggal', tanggal)
+        maks = self.conn.execute(
+            "SELECT MAX(nomor_antrean) FROM antrean WHERE tanggal = ? AND poli = ?", (tanggal, poli)
+        ).fetchone()[0]
+        return (maks or 0) + 1
+
+    def jumlah_baris(self, tabel):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {tabel}").fetchone()[0]
+
+    def tutup(self):
+        self.conn.close()
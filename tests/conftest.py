@@ -0,0 +1,24 @@
+import sys
+from pathlib import Path
+import pytest
+
+# Modul aplikasi ada di root repo (tanpa package)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import ExcelStorage
+
+
+@pytest.fixture
+def buka_storage(tmp_path):
+    """Membuka ExcelStorage di folder data sementara; semua yang dibuka ditutup di akhir tes"""
+    terbuka = []
+
+    def buka(folder=tmp_path, **opsi):
+        storage = ExcelStorage(folder / "antrean_harian.xlsx", folder / "master_pasien.xlsx", **opsi)
+        terbuka.append(storage)
+        return storage
+
+    yield buka
+    for storage in terbuka:
+        if not storage._berhenti.is_set():
+            storage.tutup()
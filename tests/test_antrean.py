@@ -0,0 +1,62 @@
+from antrean import AntreanManager, KebijakanFIFO, KebijakanPrioritas, KebijakanRoundRobin
+from schema import PRIORITAS_TINGGI, PRIORITAS_BIASA
+
+
+def panggil_semua(antrean, poli=None):
+    hasil = []
+    while True:
+        id_pasien = antrean.panggil_berikutnya(poli)
+        if id_pasien is None:
+            return hasil
+        hasil.append(id_pasien)
+
+
+def test_prioritas_didahulukan_dengan_aging():
+    antrean = AntreanManager(KebijakanPrioritas(keunggulan={PRIORITAS_TINGGI: 900}))
+    antrean.tambah_pasien('biasa-awal', 'Poli Umum', PRIORITAS_BIASA, waktu=0)
+    antrean.tambah_pasien('lansia', 'Poli Umum', PRIORITAS_TINGGI, waktu=600)
+    # Pasien biasa yang sudah menunggu lebih lama dari keunggulan tetap lebih dulu
+    antrean.tambah_pasien('lansia-telat', 'Poli Umum', PRIORITAS_TINGGI, waktu=1000)
+    antrean.tambah_pasien('biasa-akhir', 'Poli Umum', PRIORITAS_BIASA, waktu=700)
+
+    assert antrean.jumlah_menunggu('Poli Umum') == 4
+    assert antrean.posisi('lansia') == 1
+    assert antrean.posisi('biasa-akhir') == 4
+    assert panggil_semua(antrean, 'Poli Umum') == ['lansia', 'biasa-awal', 'lansia-telat', 'biasa-akhir']
+    assert list(antrean.sudah_dipanggil) == ['lansia', 'biasa-awal', 'lansia-telat', 'biasa-akhir']
+
+
+def test_fifo_mengikuti_urutan_daftar_antar_poli():
+    antrean = AntreanManager(KebijakanFIFO())
+    for i, poli in enumerate(['Poli Gigi', 'Poli Umum', 'Poli Gigi', 'Poli Lansia']):
+        antrean.tambah_pasien(f"P{i}", poli, PRIORITAS_TINGGI if i == 3 else PRIORITAS_BIASA, waktu=i)
+    assert panggil_semua(antrean) == ['P0', 'P1', 'P2', 'P3']
+
+
+def test_round_robin_berbobot_dan_melewati_poli_kosong():
+    antrean = AntreanManager(KebijakanRoundRobin(bobot={'Poli Umum': 2, 'Poli Gigi': 1, 'Poli Lansia': 1}))
+    for i in range(5):
+        antrean.tambah_pasien(f"U{i}", 'Poli Umum', waktu=i)
+    for i in range(2):
+        antrean.tambah_pasien(f"G{i}", 'Poli Gigi', waktu=i)
+
+    assert panggil_semua(antrean) == ['U0', 'G0', 'U1', 'U2', 'G1', 'U3', 'U4']
+
+
+def test_hapus_dan_ganti_kebijakan_menjaga_jumlah_dan_posisi():
+    antrean = AntreanManager(KebijakanPrioritas(keunggulan={PRIORITAS_TINGGI: 900}))
+    antrean.tambah_pasien('A', 'Poli Umum', PRIORITAS_BIASA, waktu=0)
+    antrean.tambah_pasien('B', 'Poli Umum', PRIORITAS_BIASA, waktu=10)
+    antrean.tambah_pasien('C', 'Poli Umum', PRIORITAS_TINGGI, waktu=20)
+    antrean.tambah_pasien('D', 'Poli Gigi', PRIORITAS_BIASA, waktu=30)
+
+    assert antrean.hapus_dari_aktif('A')
+    assert not antrean.hapus_dari_aktif('A')
+    assert antrean.jumlah_menunggu('Poli Umum') == 2
+    assert antrean.jumlah_menunggu() == 3
+    assert [antrean.posisi(i) for i in 'ABCD'] == [None, 2, 1, 1]
+
+    antrean.ganti_kebijakan(KebijakanFIFO())
+    assert [antrean.posisi(i) for i in 'BCD'] == [1, 2, 1]
+    assert panggil_semua(antrean, 'Poli Umum') == ['B', 'C']
+    assert antrean.jumlah_menunggu('Poli Umum') == 0
@@ -0,0 +1,149 @@
+import json
+import multiprocessing
+from antrean import AntreanManager
+from schema import PRIORITAS_TINGGI, PRIORITAS_BIASA
+
+
+def keadaan(antrean):
+    return list(antrean.antrean_aktif), list(antrean.sudah_dipanggil)
+
+
+def urutan_panggil(antrean):
+    hasil = []
+    while True:
+        id_pasien = antrean.panggil_berikutnya()
+        if id_pasien is None:
+            return hasil
+        hasil.append(id_pasien)
+
+
+def isi_antrean(antrean):
+    antrean.initialize_from_data(['M1', 'M2'], ['S1'], {
+        'M1': ('Poli Umum', PRIORITAS_BIASA, 100),
+        'M2': ('Poli Gigi', PRIORITAS_BIASA, 110),
+    })
+    antrean.tambah_pasien('L1', 'Poli Umum', PRIORITAS_TINGGI, waktu=120)
+    antrean.tambah_pasien('U3', 'Poli Umum', PRIORITAS_BIASA, waktu=130)
+    antrean.tambah_pasien('G2', 'Poli Gigi', PRIORITAS_BIASA, waktu=140)
+    antrean.panggil_berikutnya('Poli Umum')
+    antrean.hapus_dari_aktif('G2')
+    antrean.hapus_dari_dipanggil('S1')
+
+
+def test_urutan_antrean_dipulihkan_dari_journal_status(tmp_path):
+    path_state = tmp_path / "antrean_state.jsonl"
+    antrean = AntreanManager(path_state=path_state)
+    isi_antrean(antrean)
+
+    pulih = AntreanManager(path_state=path_state)
+    assert pulih.pulihkan()
+    assert keadaan(pulih) == keadaan(antrean) == (['M1', 'M2', 'U3'], ['L1'])
+    assert [pulih.posisi(i) for i in ('M1', 'M2', 'U3')] == [1, 1, 2]
+    assert urutan_panggil(pulih) == ['M1', 'M2', 'U3']
+    # Panggilan terminal yang memulihkan ikut terlihat di terminal asal
+    assert antrean.sinkronkan()
+    assert keadaan(antrean) == ([], ['L1', 'M1', 'M2', 'U3'])
+
+
+def test_pemulihan_setelah_pemadatan_dan_baris_terpotong(tmp_path):
+    path_state = tmp_path / "antrean_state.jsonl"
+    antrean = AntreanManager(path_state=path_state)
+    antrean.reset()
+    for i in range(AntreanManager.MAKS_CATATAN):
+        antrean.tambah_pasien(f"P{i}", 'Poli Umum', PRIORITAS_BIASA, waktu=i)
+        # Pasien yang batal daftar: catatan bertambah tetapi isi antrean tidak
+        if i % 4:
+            antrean.hapus_dari_aktif(f"P{i}")
+        elif i % 8 == 0:
+            antrean.panggil_berikutnya('Poli Umum')
+    with open(path_state, encoding='utf-8') as f:
+        baris = f.readlines()
+    # Journal dipadatkan menjadi snapshot, tidak tumbuh tanpa batas
+    assert json.loads(baris[0])['aksi'] == 'snapshot'
+    assert len(baris) <= AntreanManager.MAKS_CATATAN + 1
+    with open(path_state, 'ab') as f:
+        f.write(b'{"aksi": "tambah", "id": "terpo')
+
+    pulih = AntreanManager(path_state=path_state)
+    assert pulih.pulihkan()
+    assert keadaan(pulih) == keadaan(antrean)
+
+
+def test_journal_hari_lain_atau_rusak_tidak_dipulihkan(tmp_path):
+    path_state = tmp_path / "antrean_state.jsonl"
+    assert not AntreanManager(path_state=path_state).pulihkan()
+
+    path_state.write_text(json.dumps({'aksi': 'snapshot', 'tanggal': '2000-01-01',
+                                      'menunggu': [['X', 'Poli Umum', 1, 0]], 'dipanggil': []}) + '\n')
+    assert not AntreanManager(path_state=path_state).pulihkan()
+
+    path_state.write_text('bukan json\n')
+    assert not AntreanManager(path_state=path_state).pulihkan()
+
+
+def test_terminal_lain_hanya_memutar_ulang_catatan_baru(tmp_path):
+    path_state = tmp_path / "antrean_state.jsonl"
+    pendaftaran = AntreanManager(path_state=path_state)
+    pendaftaran.reset()
+    farmasi = AntreanManager(path_state=path_state)
+    assert farmasi.pulihkan()
+    snapshot_awal = path_state.read_text(encoding='utf-8').splitlines()[0]
+
+    pendaftaran.tambah_pasien('A', 'Poli Umum', waktu=1)
+    pendaftaran.tambah_pasien('B', 'Poli Umum', waktu=2)
+    assert farmasi.sinkronkan()
+    assert keadaan(farmasi) == (['A', 'B'], [])
+
+    assert farmasi.panggil_berikutnya() == 'A'
+    assert pendaftaran.sinkronkan()
+    assert keadaan(pendaftaran) == (['B'], ['A'])
+    # Sinkronisasi tidak menulis ulang journal bersama
+    assert path_state.read_text(encoding='utf-8').splitlines()[0] == snapshot_awal
+
+    # Snapshot baru dari terminal lain (mis. reset harian) dimuat ulang lewat generasi journal
+    pendaftaran.reset()
+    pendaftaran.tambah_pasien('C', 'Poli Gigi', waktu=3)
+    assert farmasi.sinkronkan()
+    assert keadaan(farmasi) == (['C'], [])
+
+    path_state.unlink()
+    assert not farmasi.sinkronkan()
+
+
+def panggil_dari_terminal(path_state, path_hasil, mulai):
+    antrean = AntreanManager(path_state=path_state)
+    antrean.pulihkan()
+    # Semua terminal sudah memuat antrean yang sama sebelum mulai memanggil
+    mulai.wait()
+    with open(path_hasil, 'w', encoding='utf-8') as f:
+        while True:
+            id_pasien = antrean.panggil_berikutnya()
+            if id_pasien is None:
+                return
+            f.write(id_pasien + '\n')
+
+
+def test_beberapa_terminal_tidak_memanggil_pasien_yang_sama(tmp_path):
+    path_state = tmp_path / "antrean_state.jsonl"
+    daftar = [f"P{i}" for i in range(150)]
+    AntreanManager(path_state=path_state).initialize_from_data(
+        daftar, [], {id_pasien: ('Poli Umum', PRIORITAS_BIASA, i) for i, id_pasien in enumerate(daftar)})
+
+    konteks = multiprocessing.get_context('spawn')
+    mulai = konteks.Barrier(3)
+    proses = [konteks.Process(target=panggil_dari_terminal,
+                              args=(path_state, tmp_path / f"terminal{t}.txt", mulai))
+              for t in range(3)]
+    for p in proses:
+        p.start()
+    for p in proses:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+
+    dipanggil = []
+    for t in range(3):
+        dipanggil += (tmp_path / f"terminal{t}.txt").read_text(encoding='utf-8').split()
+    assert sorted(dipanggil) == sorted(daftar)
+    pulih = AntreanManager(path_state=path_state)
+    assert pulih.pulihkan()
+    assert keadaan(pulih) == ([], daftar)
@@ -0,0 +1,72 @@
+import datetime
+from database import Database
+
+
+def baris_antrean(id_pasien, tanggal, nomor, poli='Poli Umum'):
+    return {'id': id_pasien, 'nomor_antrean': nomor, 'nama': f"Nama {id_pasien}", 'nik': f"{nomor:016d}",
+            'tanggal': tanggal, 'status': 'selesai', 'poli': poli}
+
+
+def test_pergantian_hari_memindahkan_antrean_lama_ke_arsip(buka_storage, tmp_path):
+    hari_ini = datetime.date.today().strftime("%Y-%m-%d")
+    storage = buka_storage()
+    storage.tambah('antrean', baris_antrean('A1', '2026-08-31', 1))
+    storage.tambah('antrean', baris_antrean('A2', '2026-09-01', 1))
+    storage.tambah('antrean', baris_antrean('A3', '2026-09-02', 1))
+    storage.tambah('antrean', baris_antrean('B1', hari_ini, 1))
+    db = Database(tmp_path / "antrean_harian.xlsx", tmp_path / "master_pasien.xlsx", storage)
+
+    assert db.arsipkan_antrean_lama() == 3
+    assert sorted(p.name for p in (tmp_path / "arsip_antrean").iterdir()) == [
+        'antrean_2026-08.csv.gz', 'antrean_2026-09.csv.gz']
+    assert list(storage.semua('antrean')['id']) == ['B1']
+    # Antrean lama tetap bisa dicari dari arsip, hari ini dari tabel
+    assert list(db.get_riwayat_antrean(id_pasien='A2')['tanggal'].dt.strftime("%Y-%m-%d")) == ['2026-09-01']
+    assert sorted(db.get_riwayat_antrean(tanggal='2026-09-02')['id']) == ['A3']
+    assert list(db.get_riwayat_antrean(id_pasien='B1')['id']) == ['B1']
+    # Pergantian hari berikutnya tanpa antrean lama tidak menulis arsip lagi
+    assert db.arsipkan_antrean_lama() == 0
+
+    storage.tutup()
+    dibuka_lagi = buka_storage()
+    assert list(dibuka_lagi.semua('antrean')['id']) == ['B1']
+    assert len(dibuka_lagi.cari_riwayat_antrean(tanggal='2026-09-01')) == 1
+
+
+
+def siapkan_pasien_terarsip(buka_storage, tmp_path):
+    storage = buka_storage()
+    for id_pasien, nik in (('P1', '3200000000000001'), ('P2', '3200000000000002')):
+        storage.tambah('master', {'id_pasien': id_pasien, 'nik': nik, 'nama': f"Nama {id_pasien}"})
+    storage.tambah('antrean', baris_antrean('P1', '2026-08-31', 1))
+    storage.tambah('antrean', baris_antrean('P1', '2026-09-01', 1))
+    storage.tambah('antrean', baris_antrean('P2', '2026-09-01', 2))
+    db = Database(tmp_path / "antrean_harian.xlsx", tmp_path / "master_pasien.xlsx", storage)
+    assert db.arsipkan_antrean_lama() == 3
+    return db
+
+
+def test_hapus_pasien_total_ikut_menghapus_riwayat_di_arsip(buka_storage, tmp_path):
+    db = siapkan_pasien_terarsip(buka_storage, tmp_path)
+
+    hasil = db.hapus_pasien_total('P1')
+    assert hasil['antrean'] == 2
+    assert hasil['master'] == 1
+    assert db.get_riwayat_antrean(id_pasien='P1').empty
+    assert list(db.get_riwayat_antrean(id_pasien='P2')['id']) == ['P2']
+    # Arsip bulan yang hanya berisi pasien terhapus tidak disisakan
+    assert sorted(p.name for p in (tmp_path / "arsip_antrean").iterdir()) == ['antrean_2026-09.csv.gz']
+
+
+def test_arsip_dikembalikan_bila_hapus_pasien_gagal(buka_storage, tmp_path):
+    db = siapkan_pasien_terarsip(buka_storage, tmp_path)
+
+    def gagal(*args, **kwargs):
+        raise OSError("disk penuh")
+    db.storage.journal.catat = gagal
+
+    assert db.hapus_pasien_total('P1') is None
+    assert sorted(db.get_riwayat_antrean(id_pasien='P1')['id']) == ['P1', 'P1']
+    assert not db.cari_pasien_master('P1').empty
+    assert sorted(p.name for p in (tmp_path / "arsip_antrean").iterdir()) == [
+        'antrean_2026-08.csv.gz', 'antrean_2026-09.csv.gz']
@@ -0,0 +1,61 @@
+import json
+from journal import Journal
+
+
+def pasien(i):
+    return {'id_pasien': f"P{i:03d}", 'nik': f"{3200000000000000 + i}", 'nama': f"Pasien {i}"}
+
+
+def matikan_paksa(storage):
+    """Seperti aplikasi yang mati mendadak: flusher berhenti tanpa menulis snapshot Excel"""
+    storage._berhenti.set()
+    storage._ada_perubahan.set()
+    storage._flusher.join(timeout=5)
+
+
+def test_journal_diputar_ulang_setelah_crash(buka_storage, tmp_path):
+    storage = buka_storage(durable=True)
+    for i in range(5):
+        storage.tambah('master', pasien(i))
+    storage.ubah('master', {'id_pasien': 'P001'}, {'nama': 'Nama Baru'})
+    storage.hapus('master', {'id_pasien': 'P004'})
+    matikan_paksa(storage)
+    assert not (tmp_path / "master_pasien.xlsx").exists()
+
+    # Baris terakhir terpotong karena aplikasi mati saat menulis
+    with open(tmp_path / "journal.jsonl", 'ab') as f:
+        f.write(b'{"tabel": "master", "aksi": "tambah", "data": {"id_pa')
+
+    pulih = buka_storage()
+    master = pulih.semua('master')
+    assert sorted(master['id_pasien']) == ['P000', 'P001', 'P002', 'P003']
+    assert pulih.cari('master', id_pasien='P001').iloc[0]['nama'] == 'Nama Baru'
+    assert pulih.cari('master', nik=pasien(2)['nik']).iloc[0]['id_pasien'] == 'P002'
+
+    # Mutasi setelah pemulihan tidak menempel pada sisa baris yang terpotong
+    pulih.tambah('master', pasien(9))
+    pulih.tutup()
+    assert sorted(buka_storage().semua('master')['id_pasien']) == ['P000', 'P001', 'P002', 'P003', 'P009']
+
+
+def test_journal_melewati_baris_rusak_dan_membaca_baru(tmp_path):
+    journal = Journal(tmp_path / "journal.jsonl")
+    journal.catat({'aksi': 'a'})
+    with open(journal.path, 'ab') as f:
+        f.write(b'{"aksi": "rus\n')
+    lain = Journal(tmp_path / "journal.jsonl")
+    assert lain.baca() == [{'aksi': 'a'}]
+
+    journal.catat({'aksi': 'b'})
+    assert lain.baca_baru() == [{'aksi': 'b'}]
+    assert lain.baca_baru() == []
+
+
+def test_rotasi_menaikkan_generasi(tmp_path):
+    journal = Journal(tmp_path / "journal.jsonl")
+    journal.catat({'aksi': 'a'})
+    assert journal.generasi() == 0
+    assert journal.rotasi() == 1
+    assert json.loads(journal.path_lama.read_text(encoding='utf-8')) == {'aksi': 'a'}
+    journal.catat({'aksi': 'b'})
+    assert [r['aksi'] for r in journal.baca()] == ['a', 'b']
@@ -0,0 +1,62 @@
+import multiprocessing
+from pathlib import Path
+import pandas as pd
+import pytest
+from database import Database
+from storage import ExcelStorage, SQLiteStorage
+
+JUMLAH_TERMINAL = 4
+PASIEN_PER_TERMINAL = 15
+
+
+def buka_database(folder, backend):
+    folder = Path(folder)
+    excel_path = folder / "antrean_harian.xlsx"
+    master_path = folder / "master_pasien.xlsx"
+    if backend == 'sqlite':
+        storage = SQLiteStorage(folder / "antrian.db")
+    else:
+        storage = ExcelStorage(excel_path, master_path)
+    return Database(excel_path, master_path, storage)
+
+
+def daftarkan(folder, backend, terminal, mulai):
+    """Satu terminal pendaftaran: mendaftarkan pasiennya ke Poli Umum sebanyak mungkin sekaligus"""
+    db = buka_database(folder, backend)
+    # Semua terminal sudah membuka data sebelum mulai mendaftarkan
+    mulai.wait()
+    try:
+        for i in range(PASIEN_PER_TERMINAL):
+            assert db.tambah_antrean_harian(f"T{terminal}-{i}", 'Poli Umum') is not None
+    finally:
+        db.tutup()
+
+
+@pytest.mark.parametrize('backend', ['excel', 'sqlite'])
+def test_nomor_unik_dari_beberapa_terminal(tmp_path, backend):
+    db = buka_database(tmp_path, backend)
+    db.storage.tambah_banyak('master', pd.DataFrame([
+        {'id_pasien': f"T{t}-{i}", 'nik': f"{t:08d}{i:08d}", 'nama': f"Pasien {t}-{i}"}
+        for t in range(JUMLAH_TERMINAL) for i in range(PASIEN_PER_TERMINAL)
+    ]))
+    db.tutup()
+
+    konteks = multiprocessing.get_context('spawn')
+    mulai = konteks.Barrier(JUMLAH_TERMINAL)
+    proses = [konteks.Process(target=daftarkan, args=(str(tmp_path), backend, t, mulai))
+              for t in range(JUMLAH_TERMINAL)]
+    for p in proses:
+        p.start()
+    for p in proses:
+        p.join(timeout=120)
+        assert p.exitcode == 0
+
+    db = buka_database(tmp_path, backend)
+    try:
+        antrean = db.get_pasien_hari_ini()
+        total = JUMLAH_TERMINAL * PASIEN_PER_TERMINAL
+        assert len(antrean) == total
+        assert sorted(antrean['nomor_antrean'].astype(int)) == list(range(1, total + 1))
+        assert antrean['kode_antrean'].is_unique
+    finally:
+        db.tutup()
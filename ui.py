@@ -6,6 +6,30 @@ import datetime
 class UI:
     def clear_screen(self):
         os.system('cls' if platform.system() == 'Windows' else 'clear')
+
+    def format_waktu(self, waktu, format="%Y-%m-%d %H:%M:%S"):
+        """Teks tanggal/waktu untuk ditampilkan, '-' bila kosong (None/NaT)"""
+        if waktu is None or pd.isna(waktu):
+            return '-'
+        if hasattr(waktu, 'strftime'):
+            return waktu.strftime(format)
+        return str(waktu)
+
+    def format_nomor(self, pasien):
+        """Kode antrean (mis. U-012), atau nomor saja untuk data lama tanpa kode"""
+        kode = pasien.get('kode_antrean')
+        if kode is not None and pd.notna(kode):
+            return str(kode)
+        nomor = pasien.get('nomor_antrean')
+        return str(nomor) if nomor is not None and pd.notna(nomor) else '-'
+
+    def ucapan_nomor(self, pasien):
+        """Nomor antrean untuk suara, mis. 'U 12'"""
+        kode = self.format_nomor(pasien)
+        if '-' in kode:
+            prefix, nomor = kode.split('-', 1)
+            return f"{prefix} {nomor.lstrip('0') or '0'}"
+        return kode
     
     def tampilkan_banner(self, menunggu, terpanggil):
         self.clear_screen()
@@ -65,7 +89,7 @@ class UI:
             for i, pasien in enumerate(daftar_antrean, 1):
                 poli = pasien.get('poli', '-')
                 nik = pasien.get('nik', '-')
-                print(f"{i:<5}{pasien['nomor_antrean']:<15}{pasien['nama']:<30}{nik:<20}{poli:<15}")
+                print(f"{i:<5}{self.format_nomor(pasien):<15}{pasien['nama']:<30}{nik:<20}{poli:<15}")
     
     def tampilkan_terpanggil(self, daftar_pasien):
         self.clear_screen()
@@ -80,7 +104,7 @@ class UI:
         print("-" * 105)
         
         for i, pasien in enumerate(daftar_pasien, 1):
-            waktu_panggil = pasien.get('waktu_panggil', '-') if pasien.get('waktu_panggil') else '-'
+            waktu_panggil = self.format_waktu(pasien.get('waktu_panggil'))
             poli = pasien.get('poli', '-')
             print(f"{i:<5}{pasien['nama']:<25}{waktu_panggil:<25}{pasien['status']:<20}{poli:<30}")
     
@@ -93,13 +117,13 @@ class UI:
             for _, pasien in hasil.iterrows():
                 print(f"ID           : {pasien['id']}")
                 print(f"Nama         : {pasien['nama']}")
-                print(f"No. Antrean  : {pasien['nomor_antrean']}")
+                print(f"No. Antrean  : {self.format_nomor(pasien)}")
                 print(f"NIK          : {pasien.get('nik', '-')}")
                 print(f"Poli         : {pasien.get('poli', '-')}")
                 print(f"Status       : {pasien['status']}")
-                print(f"Waktu Daftar : {pasien['waktu_daftar']}")
-                if pasien['waktu_panggil'] and pd.notna(pasien['waktu_panggil']):
-                    print(f"Waktu Panggil: {pasien['waktu_panggil']}")
+                print(f"Waktu Daftar : {self.format_waktu(pasien['waktu_daftar'])}")
+                if pd.notna(pasien['waktu_panggil']):
+                    print(f"Waktu Panggil: {self.format_waktu(pasien['waktu_panggil'])}")
                 print("-" * 90)
     
     def form_pendaftaran_pasien_baru(self):
@@ -188,6 +212,22 @@ class UI:
             else:
                 print("Pilihan tidak valid! Silakan pilih 1-3.")
     
+    def pilih_poli_panggilan(self, jumlah_menunggu):
+        """Poli yang akan dipanggil, atau None untuk memilih otomatis sesuai kebijakan antrean"""
+        print("\n=== PANGGIL PASIEN DARI ===")
+        print("0. Otomatis (semua poli)")
+        daftar_poli = list(jumlah_menunggu)
+        for i, poli in enumerate(daftar_poli, 1):
+            print(f"{i}. {poli:<12} ({jumlah_menunggu[poli]} menunggu)")
+        
+        while True:
+            pilihan = input(f"\nPilih poli (0-{len(daftar_poli)}): ").strip()
+            if pilihan in ('', '0'):
+                return None
+            if pilihan.isdigit() and 1 <= int(pilihan) <= len(daftar_poli):
+                return daftar_poli[int(pilihan) - 1]
+            print(f"Pilihan tidak valid! Silakan pilih 0-{len(daftar_poli)}.")
+    
     def tampilkan_pendaftaran_master_berhasil(self, nama, qr_path):
         self.clear_screen()
         print("="*70)
@@ -238,17 +278,18 @@ class UI:
         print(f"Tanggal Lahir : {pasien_master.get('tanggal_lahir', '-')}")
         print(f"Alamat        : {pasien_master.get('alamat', '-')}")
         print(f"Riwayat Penyakit : {pasien_master.get('riwayat_penyakit', '-')}")
-        print(f"Tanggal Daftar   : {pasien_master.get('tanggal_daftar_pertama', '-')}")
-        print(f"QR Code Path     : {pasien_master.get('qr_code_path', '-')}")
+        print(f"Tanggal Daftar   : {self.format_waktu(pasien_master.get('tanggal_daftar_pertama'))}")
+        qr_path = pasien_master.get('qr_code_path')
+        print(f"QR Code          : {qr_path if isinstance(qr_path, str) and qr_path else 'Tersimpan di paket QR'}")
         
         if pasien_antrean is not None:
             print("\nDATA ANTREAN HARI INI:")
             print("-" * 60)
-            print(f"Nomor Antrean : {pasien_antrean.get('nomor_antrean', '-')}")
+            print(f"Nomor Antrean : {self.format_nomor(pasien_antrean)}")
             print(f"Poli          : {pasien_antrean.get('poli', '-')}")
             print(f"Status        : {pasien_antrean.get('status', '-')}")
-            print(f"Waktu Daftar  : {pasien_antrean.get('waktu_daftar', '-')}")
-            print(f"Waktu Panggil : {pasien_antrean.get('waktu_panggil', '-')}")
+            print(f"Waktu Daftar  : {self.format_waktu(pasien_antrean.get('waktu_daftar'))}")
+            print(f"Waktu Panggil : {self.format_waktu(pasien_antrean.get('waktu_panggil'))}")
             print("-" * 60)
     
     def form_edit_pasien(self, pasien_data):